@@ -0,0 +1,169 @@
+# Semantic cache of final answers, keyed by query embedding
+import sqlite3
+import threading
+import time
+import numpy as np
+from config import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_PATH,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+)
+import metrics
+from numpy_store import normalize
+
+
+class AnswerCache:
+    """
+    Stores (query embedding, answer) pairs in SQLite and answers a new query
+    with the stored answer of the most similar previous query, if its cosine
+    similarity is at least `threshold`. Every entry is tagged with the index
+    version it was answered from: entries of any other version are dropped,
+    as are entries older than `ttl` seconds. Past max_entries the least
+    recently used entries go first. Lookups scan an in-memory matrix of the
+    current version's embeddings, so a hit costs one matmul.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        path=ANSWER_CACHE_PATH,
+        threshold=ANSWER_CACHE_THRESHOLD,
+        ttl=ANSWER_CACHE_TTL,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = None
+        self.ids = []
+        self.matrix = None
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+        self.path = path
+        self._db = None
+
+    @property
+    def db(self):
+        """SQLite connection, opened the first time the cache is used."""
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "id INTEGER PRIMARY KEY, query TEXT NOT NULL, vector BLOB NOT NULL, "
+                "answer TEXT NOT NULL, version TEXT, created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            self._db = db
+        return self._db
+
+    def load(self, version):
+        """Drops other versions' and expired entries, then loads the rest."""
+        self.db.execute("DELETE FROM answers WHERE version IS NOT ?", (version,))
+        self.db.execute(
+            "DELETE FROM answers WHERE created_at < ?", (time.time() - self.ttl,)
+        )
+        self.db.commit()
+
+        rows = self.db.execute("SELECT id, vector FROM answers ORDER BY id").fetchall()
+        self.version = version
+        self.ids = [row_id for row_id, _ in rows]
+        self.matrix = (
+            np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            if rows
+            else None
+        )
+
+    def get(self, query, version, vector=None):
+        """Cached answer for a query similar enough to `query`, or None."""
+        version = str(version)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+        vector = normalize(np.asarray(vector, dtype=np.float32))
+
+        with self.lock:
+            if version != self.version:
+                self.load(version)
+            if self.matrix is None:
+                self.misses += 1
+                metrics.inc("answer_cache_misses_total")
+                return None
+
+            scores = self.matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                metrics.inc("answer_cache_misses_total")
+                return None
+
+            row = self.db.execute(
+                "SELECT answer, created_at FROM answers WHERE id = ?",
+                (self.ids[best],),
+            ).fetchone()
+            if row is None or row[1] < time.time() - self.ttl:
+                self.misses += 1
+                metrics.inc("answer_cache_misses_total")
+                return None
+
+            self.db.execute(
+                "UPDATE answers SET accessed_at = ? WHERE id = ?",
+                (time.time(), self.ids[best]),
+            )
+            self.db.commit()
+            self.hits += 1
+            metrics.inc("answer_cache_hits_total")
+            return row[0]
+
+    def put(self, query, answer, version, vector=None):
+        version = str(version)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+        vector = normalize(np.asarray(vector, dtype=np.float32))
+
+        with self.lock:
+            if version != self.version:
+                self.load(version)
+
+            now = time.time()
+            cursor = self.db.execute(
+                "INSERT INTO answers "
+                "(query, vector, answer, version, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (query, vector.tobytes(), answer, version, now, now),
+            )
+            self.db.commit()
+            self.ids.append(cursor.lastrowid)
+            self.matrix = (
+                vector[None, :]
+                if self.matrix is None
+                else np.vstack([self.matrix, vector])
+            )
+            self.evict()
+
+    def evict(self):
+        count = self.db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM answers WHERE id IN "
+                "(SELECT id FROM answers ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self.db.commit()
+            self.load(self.version)
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM answers")
+            self.db.commit()
+            self.version, self.ids, self.matrix = None, [], None
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
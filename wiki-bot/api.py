@@ -0,0 +1,187 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from pydantic import BaseModel
+from starlette.responses import PlainTextResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from config import INDEX_MAX_AGE, VECTOR_BACKEND
+from graph import build_fast_workflow
+from llm import embeddings, llm_cache
+import metrics
+from runner import answer_cache, stream_query
+from vector_store import get_bm25_index, get_vector_store, index_version
+
+# Built once per process: graph, store handles and clients stay warm
+workflow = build_fast_workflow()
+
+
+class Flight:
+    """
+    One graph run shared by every request for the same question. Events are
+    recorded, so a request that joins late first gets what it missed.
+    """
+
+    def __init__(self, question):
+        self.events = []
+        self.listeners = []
+        self.done = False
+        self.task = asyncio.create_task(self.run(question))
+
+    async def run(self, question):
+        try:
+            async for event in stream_query(workflow, question):
+                self.publish(event)
+        except Exception as e:
+            self.publish({"type": "error", "message": str(e)})
+        finally:
+            self.done = True
+            for queue in self.listeners:
+                queue.put_nowait(None)
+
+    def publish(self, event):
+        self.events.append(event)
+        for queue in self.listeners:
+            queue.put_nowait(event)
+
+    async def subscribe(self):
+        queue = asyncio.Queue()
+        # Replay and registration happen without a yield in between,
+        # so no event is missed or seen twice
+        backlog = list(self.events)
+        if not self.done:
+            self.listeners.append(queue)
+        try:
+            for event in backlog:
+                yield event
+            if self.done:
+                return
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            if queue in self.listeners:
+                self.listeners.remove(queue)
+
+
+# Normalized question -> Flight, while its graph run is in progress
+flights = {}
+
+
+def question_key(question):
+    return " ".join(question.lower().split())
+
+
+def join_flight(question):
+    """Subscribes to the in-flight run for `question`, starting one if needed."""
+    key = question_key(question)
+    flight = flights.get(key)
+    if flight is None or flight.done:
+        flight = flights[key] = Flight(question)
+
+        def land(_):
+            if flights.get(key) is flight:
+                del flights[key]
+
+        flight.task.add_done_callback(land)
+    return flight.subscribe()
+
+
+@asynccontextmanager
+async def lifespan(api):
+    # Open (and warm) the stores before the first request instead of during it
+    await asyncio.to_thread(get_vector_store)
+    await asyncio.to_thread(get_bm25_index)
+    yield
+
+
+api = FastAPI(title="Wiki Bot API", lifespan=lifespan)
+
+
+# Request/Response models
+class QuestionRequest(BaseModel):
+    question: str
+
+
+class AnswerResponse(BaseModel):
+    answer: str | None
+    cached: bool
+    sources: list[str] | None
+
+
+api.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:5173"],  # Your React dev server
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+@api.get("/")
+async def get_health():
+    return {"status": "ok"}
+
+
+@api.get("/health")
+async def get_index_health():
+    """Liveness plus index freshness: when the served index was last written."""
+    version = index_version(VECTOR_BACKEND)
+    if version is None:
+        return {"status": "no_index", "index": {"backend": VECTOR_BACKEND}}
+
+    age = time.time() - version / 1e9
+    return {
+        "status": "stale" if age > INDEX_MAX_AGE else "ok",
+        "index": {
+            "backend": VECTOR_BACKEND,
+            "updated_at": datetime.fromtimestamp(
+                version / 1e9, tz=timezone.utc
+            ).isoformat(),
+            "age_seconds": round(age),
+            "bm25": index_version("bm25") is not None,
+        },
+        "in_flight": len(flights),
+        "caches": {
+            "answers": answer_cache.stats(),
+            "embeddings": embeddings.stats(),
+            "llm": llm_cache.stats(),
+        },
+    }
+
+
+@api.get("/metrics")
+async def get_metrics():
+    return PlainTextResponse(metrics.render_prometheus())
+
+
+@api.get("/stream")
+async def stream_answer(question: str):
+    async def generate():
+        async for event in join_flight(question):
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(generate(), media_type="text/event-stream")
+
+
+@api.post("/ask", response_model=AnswerResponse)
+async def ask(request: QuestionRequest):
+    result = None
+    async for event in join_flight(request.question):
+        if event["type"] in ("answer", "error"):
+            result = event
+
+    if result is None or result["type"] == "error":
+        raise HTTPException(
+            status_code=500, detail=result["message"] if result else "No answer"
+        )
+    return AnswerResponse(
+        answer=result["text"], cached=result["cached"], sources=result["sources"]
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(api, host="0.0.0.0", port=8000)
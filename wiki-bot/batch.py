@@ -0,0 +1,91 @@
+# Answers a file of questions concurrently and writes one JSON line per answer
+import asyncio
+import json
+import sys
+import time
+from config import BATCH_CONCURRENCY, METRICS_ENABLED, VECTOR_BACKEND
+from graph import build_fast_workflow, build_workflow
+from llm import embeddings, report_llm_cache
+import metrics
+from runner import answer_cache, initial_state
+from vector_store import index_version
+from fun_args import argumentize
+
+
+def read_questions(path):
+    """One question per line from `path` ("-" = stdin), blank lines skipped."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def result_record(question, state):
+    if isinstance(state, Exception):
+        return {"question": question, "error": repr(state)}
+
+    return {
+        "question": question,
+        "answer": state.get("summarize_node_output"),
+        "sources": state.get("context_sources", []),
+        "node_timings": {
+            node: round(seconds, 4)
+            for node, seconds in state.get("node_timings", {}).items()
+        },
+    }
+
+
+async def main(
+    questions: str = "-",
+    output: str = "-",
+    concurrency: int = BATCH_CONCURRENCY,
+    fast: bool = False,
+    cache_answers: bool = True,
+    record_metrics: bool = METRICS_ENABLED,
+):
+    """
+    Runs every question in `questions` through one compiled graph, at most
+    `concurrency` at a time, and writes JSONL to `output` ("-" = stdout).
+    With cache_answers the answers also pre-warm the semantic answer cache.
+    """
+    metrics.enable(record_metrics)
+    queries = read_questions(questions)
+    app = build_fast_workflow() if fast else build_workflow()
+
+    start = time.perf_counter()
+    states = await app.abatch(
+        [initial_state(q) for q in queries],
+        config={"max_concurrency": concurrency},
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+
+    records = [result_record(q, s) for q, s in zip(queries, states)]
+    lines = [json.dumps(r, ensure_ascii=False) + "\n" for r in records]
+    if output == "-":
+        sys.stdout.writelines(lines)
+    else:
+        with open(output, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+
+    if cache_answers:
+        version = index_version(VECTOR_BACKEND)
+        answered = [r for r in records if r.get("answer")]
+        # One batched embedding call instead of one round-trip per question
+        vectors = await embeddings.aembed_documents([r["question"] for r in answered])
+        for record, vector in zip(answered, vectors):
+            answer_cache.put(record["question"], record["answer"], version, vector)
+
+    failed = sum(1 for r in records if "error" in r)
+    print(
+        f"Answered {len(records) - failed}/{len(records)} questions in {elapsed:.1f}s "
+        f"({len(records) / max(elapsed, 1e-9) * 60:.0f} questions/min)",
+        file=sys.stderr,
+    )
+    report_llm_cache()
+
+
+if __name__ == "__main__":
+    asyncio.run(argumentize(main))
@@ -0,0 +1,86 @@
+# Chunking throughput / output size: MarkdownChunker vs the old character splitter
+import random
+import time
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from chunker import MarkdownChunker
+from crawl_cache import CrawlCache, make_document
+from extract import html_to_markdown
+from tokens import count_tokens
+from fun_args import argumentize
+
+WORDS = "pcu sd logger board telemetry sensor battery firmware can bus voltage pod brake levitation inverter".split()
+
+
+def synthetic_page(rng, i):
+    """
+    A wiki-like page: nested sections with prose, a table and a code block,
+    rendered as HTML and converted like crawled pages (html2text tables have
+    no outer pipes, <pre> becomes indented lines).
+    """
+
+    def sentence():
+        return " ".join(rng.choices(WORDS, k=rng.randint(8, 20))).capitalize() + "."
+
+    def paragraph(sentences):
+        return "<p>" + " ".join(sentence() for _ in range(sentences)) + "</p>"
+
+    parts = []
+    for s in range(rng.randint(2, 5)):
+        parts.append(f"<h2>Section {s}</h2>")
+        parts.append(paragraph(rng.randint(3, 12)))
+        for sub in range(rng.randint(0, 3)):
+            parts.append(f"<h3>Subsection {s}.{sub}</h3>")
+            parts.append(paragraph(rng.randint(2, 8)))
+        if rng.random() < 0.5:
+            rows = "".join(
+                f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.randint(0, 999)}</td></tr>"
+                for _ in range(8)
+            )
+            parts.append(f"<table><tr><th>Name</th><th>Value</th></tr>{rows}</table>")
+        if rng.random() < 0.3:
+            code = "\n".join(f"x{n} = {n}" for n in range(10))
+            parts.append(f"<pre><code>{code}</code></pre>")
+
+    html = f'<html><body><div class="contents">{"".join(parts)}</div></body></html>'
+    return make_document(f"https://wiki/page-{i}", f"Page {i}", html_to_markdown(html))
+
+
+def load_corpus(pages):
+    cache = CrawlCache()
+    documents = list(cache.iter_documents())
+    cache.close()
+    if documents:
+        return documents[:pages]
+
+    rng = random.Random(0)
+    return [synthetic_page(rng, i) for i in range(pages)]
+
+
+def measure(name, splitter, documents):
+    start = time.perf_counter()
+    chunks = splitter.split_documents(documents)
+    seconds = time.perf_counter() - start
+
+    size = sum(len(d.page_content) for d in documents) / 1e6
+    tokens = sum(count_tokens(c.page_content) for c in chunks)
+    print(
+        f"{name:<12} {len(chunks):>7} chunks {tokens:>9} tokens "
+        f"{tokens / max(1, len(chunks)):>6.0f} tok/chunk "
+        f"{len(documents) / seconds:>8.0f} docs/s {size / seconds:>6.2f} MB/s"
+    )
+
+
+def main(pages=2000):
+    """Chunks the crawl cache (or a synthetic corpus if it's empty) both ways."""
+    documents = load_corpus(pages)
+    print(f"Chunking {len(documents)} documents...")
+    measure(
+        "recursive",
+        RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100),
+        documents,
+    )
+    measure("markdown", MarkdownChunker(), documents)
+
+
+if __name__ == "__main__":
+    argumentize(main)
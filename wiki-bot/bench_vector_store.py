@@ -0,0 +1,121 @@
+# Query latency / memory benchmark: Chroma vs the NumPy index variants
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import numpy as np
+from langchain_chroma import Chroma
+from numpy_store import NumpyVectorStore, normalize
+from fun_args import argumentize
+
+VARIANTS = {
+    "chroma": None,
+    "numpy-f32": {"quantized": False, "ivf_min_rows": float("inf")},
+    "numpy-int8": {"quantized": True, "ivf_min_rows": float("inf")},
+    "numpy-ivf": {"quantized": True, "ivf_min_rows": 0},
+}
+
+
+def synthetic_store(path, rows, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    store = Chroma(persist_directory=path, collection_name="bench")
+    for start in range(0, rows, 5000):
+        end = min(start + 5000, rows)
+        store._collection.add(
+            ids=[str(i) for i in range(start, end)],
+            # Unit rows, so Chroma's L2 ranking matches cosine
+            embeddings=normalize(
+                rng.standard_normal((end - start, dim), dtype=np.float32)
+            ),
+            documents=[f"chunk {i}" for i in range(start, end)],
+            metadatas=[{"source": f"page-{i // 10}"} for i in range(start, end)],
+        )
+    return store
+
+
+def open_variant(variant, root):
+    if variant == "chroma":
+        return Chroma(
+            persist_directory=os.path.join(root, "chroma"), collection_name="bench"
+        )
+    return NumpyVectorStore(os.path.join(root, variant), embedding=None)
+
+
+def search(store, query, k):
+    if isinstance(store, Chroma):
+        return store.similarity_search_by_vector_with_relevance_scores(query, k=k)
+    return store.similarity_search_by_vector_with_score(query, k=k)
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(variant, root, queries, k, results):
+    """Runs in a fresh process so RSS is not shared between backends."""
+    before = rss_mb()
+    start = time.perf_counter()
+    store = open_variant(variant, root)
+    search(store, queries[0], k)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    latencies, hits = [], []
+    for query in queries:
+        start = time.perf_counter()
+        docs = search(store, query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits.append([doc.id for doc, _ in docs])
+
+    results[variant] = {
+        "load_ms": load_ms,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "rss_mb": rss_mb() - before,
+        "hits": hits,
+    }
+
+
+def main(rows=50_000, dim=1536, queries=200, k=5):
+    """Builds a synthetic index of `rows` x `dim` embeddings and compares backends."""
+    root = tempfile.mkdtemp(prefix="bench_vector_store_")
+    print(f"Building {rows} x {dim} synthetic index in {root}...")
+    chroma = synthetic_store(os.path.join(root, "chroma"), rows, dim)
+    for variant, options in VARIANTS.items():
+        if options is not None:
+            NumpyVectorStore.build(chroma, os.path.join(root, variant), **options)
+
+    rng = np.random.default_rng(1)
+    query_vectors = rng.standard_normal((queries, dim), dtype=np.float32).tolist()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Manager().dict()
+    for variant in VARIANTS:
+        process = ctx.Process(
+            target=run_variant, args=(variant, root, query_vectors, k, results)
+        )
+        process.start()
+        process.join()
+
+    # Recall against exact float32 search
+    exact = results["numpy-f32"]["hits"]
+    print(
+        f"{'backend':<12} {'load ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8} {'recall':>7}"
+    )
+    for variant in VARIANTS:
+        r = results[variant]
+        recall = np.mean(
+            [len(set(a) & set(b)) / len(b) for a, b in zip(r["hits"], exact)]
+        )
+        print(
+            f"{variant:<12} {r['load_ms']:>9.1f} {r['p50_ms']:>8.2f} "
+            f"{r['p95_ms']:>8.2f} {r['rss_mb']:>8.1f} {recall:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    argumentize(main)
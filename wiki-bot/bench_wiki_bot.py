@@ -0,0 +1,408 @@
+# Offline end-to-end benchmark: indexing throughput, retrieval recall@k / MRR and
+# per-node graph latency on a fixture wiki, with hashed n-gram embeddings and a
+# scripted chat model instead of OpenAI. Results go to JSON for commit-to-commit diffs.
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk
+from bm25 import tokenize
+from crawl_cache import make_document
+from numpy_store import normalize
+from fun_args import argumentize
+
+COMPONENTS = [
+    "battery pack",
+    "inverter",
+    "levitation unit",
+    "brake system",
+    "pcu",
+    "sd logger",
+    "telemetry board",
+    "can bus",
+    "cooling loop",
+    "chassis",
+    "propulsion motor",
+    "vacuum tube",
+    "sensor hub",
+    "bms",
+    "pneumatics",
+    "ground station",
+]
+# attribute -> (unit, value range, question templates)
+FACTS = {
+    "nominal voltage": (
+        "V",
+        (12, 800),
+        [
+            "What is the nominal voltage of the {title}?",
+            "Which voltage does the {title} run at?",
+        ],
+    ),
+    "mass": (
+        "kg",
+        (1, 300),
+        ["What is the mass of the {title}?", "How heavy is the {title}?"],
+    ),
+    "maximum operating temperature": (
+        "°C",
+        (40, 120),
+        [
+            "What is the maximum operating temperature of the {title}?",
+            "How hot can the {title} get?",
+        ],
+    ),
+    "sampling rate": (
+        "Hz",
+        (10, 5000),
+        [
+            "What is the sampling rate of the {title}?",
+            "How often does the {title} sample?",
+        ],
+    ),
+}
+FILLER = (
+    "pod firmware test track telemetry sensor wiring harness connector calibration "
+    "safety review run log vacuum pressure team meeting design iteration simulation "
+    "bench setup procedure checklist fault current limit thermal margin"
+).split()
+WORKFLOWS = ("full", "fast")
+MODES = ("dense", "hybrid")
+
+
+@functools.lru_cache(maxsize=None)
+def feature_slot(feature, dim):
+    """(index, sign) of a feature: stable across processes, unlike hash()."""
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    h = int.from_bytes(digest, "little")
+    return h % dim, 1.0 if h >> 63 else -1.0
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic local embeddings: words, word bigrams and character trigrams
+    hashed into `dim` signed buckets, L2-normalized. No API, no model download.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def embed(self, text):
+        words = tokenize(text)
+        features = [*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(padded[i : i + 3] for i in range(len(padded) - 2))
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in features:
+            slot, sign = feature_slot(feature, self.dim)
+            vector[slot] += sign
+        return normalize(vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed(text)
+
+
+QUERY_RE = re.compile(r"Here's the query:\s*(.*)", re.S)
+INTENT_RE = re.compile(r"""'intent': ['"](.*?)['"],""")
+
+
+class ScriptedChatModel:
+    """
+    Stands in for the OpenAI client. Answers each graph node by its prompt:
+    intent / analysis JSON echoing the question, the question as search query
+    and a fixed answer streamed word by word. Every call waits `latency` seconds.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def reply(self, messages):
+        system, prompt = messages[0]["content"], messages[1]["content"]
+        match = QUERY_RE.search(prompt)
+        query = match.group(1).strip() if match else prompt.strip()
+
+        if "search_query" in system:
+            return json.dumps(
+                {"intent": query, "need_more_info": False, "search_query": query}
+            )
+        if "JSON" in system:
+            return json.dumps({"intent": query, "need_more_info": False})
+        if "search optimizer" in system:
+            match = INTENT_RE.search(prompt)
+            return match.group(1) if match else prompt
+        return "The answer is in the wiki context above."
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.reply(messages))
+
+    async def astream(self, messages):
+        await asyncio.sleep(self.latency)
+        for word in self.reply(messages).split(" "):
+            yield AIMessageChunk(content=word + " ")
+
+
+def fixture_corpus(pages, seed=0):
+    """
+    Wiki pages "<Component> v<N>" with a Specifications section of unique facts
+    plus filler sections, and one labelled question per page:
+    [{"question", "source"}], source being the URL of the page that answers it.
+    """
+    rng = random.Random(seed)
+
+    def filler(title, sentences):
+        return " ".join(
+            f"The {title} " + " ".join(rng.choices(FILLER, k=rng.randint(6, 14))) + "."
+            for _ in range(sentences)
+        )
+
+    documents, questions = [], []
+    for i in range(pages):
+        component = COMPONENTS[i % len(COMPONENTS)]
+        title = f"{component.title()} v{i // len(COMPONENTS) + 1}"
+        url = f"https://wiki.fixture/{component.replace(' ', '-')}-v{i // len(COMPONENTS) + 1}"
+
+        facts = []
+        for attribute, (unit, (low, high), _) in FACTS.items():
+            facts.append(
+                f"The {attribute} of the {title} is {rng.randint(low, high)} {unit}."
+            )
+        sections = [
+            f"# {title}",
+            filler(title, rng.randint(2, 4)),
+            "## Specifications",
+            " ".join(facts),
+        ]
+        for heading in rng.sample(["Firmware", "Testing", "Known issues", "Wiring"], 3):
+            sections.extend([f"## {heading}", filler(title, rng.randint(4, 12))])
+        documents.append(make_document(url, title, "\n\n".join(sections)))
+
+        attribute = rng.choice(list(FACTS))
+        template = rng.choice(FACTS[attribute][2])
+        questions.append({"question": template.format(title=title), "source": url})
+    return documents, questions
+
+
+def percentiles(seconds):
+    if not seconds:
+        return {"p50_ms": 0.0, "p95_ms": 0.0}
+    return {
+        "p50_ms": round(float(np.percentile(seconds, 50)) * 1000, 3),
+        "p95_ms": round(float(np.percentile(seconds, 95)) * 1000, 3),
+    }
+
+
+def load_app(dim, llm_latency):
+    """
+    Imports the wiki-bot modules with the offline doubles plugged in. Call it
+    from the work directory: the stores and caches use relative paths.
+    """
+    os.environ.setdefault("OPENAI_API_KEY", "offline")
+    os.environ["LANGSMITH_TRACING"] = os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    import llm
+
+    llm.embeddings.base = HashingEmbeddings(dim)
+    llm.embeddings.model_name = f"hashing-{dim}"
+    llm.openai_client = llm.json_client = ScriptedChatModel(llm_latency)
+    llm.llm_cache.enabled = False  # every question must reach the model
+
+
+def bench_indexing(documents):
+    from vector_store import build_numpy_index, populate_vector_store
+
+    start = time.perf_counter()
+    store = populate_vector_store(documents, reset=True)
+    seconds = time.perf_counter() - start
+    chunks = store._collection.count()
+
+    # Same documents again: every chunk ID is already stored, nothing is embedded
+    start = time.perf_counter()
+    populate_vector_store(documents)
+    reindex_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    build_numpy_index()
+    numpy_seconds = time.perf_counter() - start
+
+    return {
+        "documents": len(documents),
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "documents_per_second": round(len(documents) / seconds, 1),
+        "chunks_per_second": round(chunks / seconds, 1),
+        "reindex_seconds": round(reindex_seconds, 3),
+        "numpy_build_seconds": round(numpy_seconds, 3),
+    }
+
+
+def bench_retrieval(questions, k):
+    """recall@k, MRR and latency of retrieve() per mode, at source (page) level."""
+    from retriever import retrieve
+
+    results = {}
+    for mode in MODES:
+        hits, reciprocal_ranks, latencies = 0, [], []
+        for q in questions:
+            start = time.perf_counter()
+            docs = retrieve(q["question"], k=k, mode=mode)
+            latencies.append(time.perf_counter() - start)
+
+            sources = [doc.metadata.get("source") for doc in docs]
+            rank = sources.index(q["source"]) + 1 if q["source"] in sources else None
+            hits += rank is not None
+            reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+        results[mode] = {
+            f"recall@{k}": round(hits / len(questions), 4),
+            "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+            **percentiles(latencies),
+        }
+    return results
+
+
+async def bench_graph(questions):
+    """Per-node and total latency of both graphs, one question at a time."""
+    from graph import build_fast_workflow, build_workflow
+    from runner import initial_state
+
+    results = {}
+    for name, app in zip(WORKFLOWS, (build_workflow(), build_fast_workflow())):
+        timings, totals, found = {}, [], 0
+        for q in questions:
+            start = time.perf_counter()
+            state = await app.ainvoke(initial_state(q["question"]))
+            totals.append(time.perf_counter() - start)
+
+            for node, seconds in state["node_timings"].items():
+                timings.setdefault(node, []).append(seconds)
+            found += q["source"] in state["context_sources"]
+
+        results[name] = {
+            "context_recall": round(found / len(questions), 4),
+            "total": percentiles(totals),
+            "nodes": {node: percentiles(s) for node, s in sorted(timings.items())},
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(baseline, results, tolerance):
+    """Prints every metric that got worse than `baseline` by more than `tolerance`."""
+    if baseline.get("config") != results["config"]:
+        print(f"Warning: baseline config differs: {baseline.get('config')}")
+
+    old, new = flatten(baseline), flatten(results)
+    regressions = []
+    for key, value in new.items():
+        before = old.get(key)
+        if not before or key.startswith(("config.", "indexing.documents")):
+            continue
+        # Latencies should go down, everything else (recall, throughput) up
+        higher_is_worse = key.endswith("_ms") or key.endswith("seconds")
+        change = (value - before) / before
+        if (change if higher_is_worse else -change) > tolerance:
+            regressions.append(f"  {key}: {before} -> {value} ({change:+.0%})")
+
+    print(
+        f"{len(regressions)} regression(s) vs {baseline.get('commit')}"
+        + ("" if not regressions else ":\n" + "\n".join(regressions))
+    )
+
+
+def main(
+    pages: int = 192,
+    questions: int = 96,
+    k: int = 5,
+    dim: int = 384,
+    llm_latency: float = 0.0,
+    output: str = "bench_wiki_bot.json",
+    baseline: str = None,
+    tolerance: float = 0.25,
+):
+    """
+    Indexes a fixture corpus of `pages` pages in a temporary directory, then
+    measures retrieval and both graphs on `questions` labelled questions.
+    Writes the results to `output` and, given a previous results file as
+    `baseline`, lists what regressed by more than `tolerance` (0.25 = 25%).
+    """
+    output = os.path.abspath(output)
+    documents, labelled = fixture_corpus(pages)
+    labelled = random.Random(1).sample(labelled, min(questions, len(labelled)))
+
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="bench_wiki_bot_")
+    os.chdir(workdir)
+    try:
+        load_app(dim, llm_latency)
+        print(f"Indexing {len(documents)} fixture pages in {workdir}...")
+        indexing = bench_indexing(documents)
+        print(f"Running {len(labelled)} questions...")
+        retrieval = bench_retrieval(labelled, k)
+        graph = asyncio.run(bench_graph(labelled))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "pages": pages,
+            "questions": len(labelled),
+            "k": k,
+            "dim": dim,
+            "llm_latency": llm_latency,
+        },
+        "indexing": indexing,
+        "retrieval": retrieval,
+        "graph": graph,
+    }
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({"indexing": indexing, "retrieval": retrieval}, indent=2))
+    print(f"Results written to {output}")
+
+    if baseline:
+        with open(baseline) as f:
+            compare(json.load(f), results, tolerance)
+
+
+if __name__ == "__main__":
+    argumentize(main)
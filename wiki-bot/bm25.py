@@ -0,0 +1,102 @@
+# Okapi BM25 keyword index over the stored chunks (JSON file next to Chroma)
+import json
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+from langchain_core.documents import Document
+from config import BM25_B, BM25_K1
+from numpy_store import get_all
+
+# Words and numbers; part names like "SD-logger" or "PCU_v2" index as their parts
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Inverted index: term -> (chunk rows, term frequencies). Built from the
+    Chroma collection with `build()`, so it always covers the same chunks as
+    the dense index, and searched with a scatter-add over the query's postings.
+    """
+
+    def __init__(self, path, k1=BM25_K1, b=BM25_B):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        with open(path) as f:
+            data = json.load(f)
+        self.ids = data["ids"]
+        self.texts = data["documents"]
+        self.metadatas = data["metadatas"]
+        self.lengths = np.asarray(data["lengths"], dtype=np.float32)
+        self.avg_length = float(self.lengths.mean()) if len(self.lengths) else 0.0
+        self.postings = {
+            term: (np.asarray(rows, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            for term, (rows, tfs) in data["postings"].items()
+        }
+
+    @classmethod
+    def build(cls, chroma_store, path):
+        """Indexes every chunk of a Chroma store into a BM25 file at `path`."""
+        data = get_all(chroma_store, ["documents", "metadatas"])
+
+        postings, lengths = {}, []
+        for row, text in enumerate(data["documents"]):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                rows, tfs = postings.setdefault(term, ([], []))
+                rows.append(row)
+                tfs.append(tf)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "ids": data["ids"],
+                    "documents": data["documents"],
+                    "metadatas": data["metadatas"],
+                    "lengths": lengths,
+                    "postings": postings,
+                },
+                f,
+            )
+        os.replace(tmp_path, path)
+        return len(data["ids"])
+
+    def search(self, query, k):
+        """Returns [(row, score)] for the k best-scoring rows, best first."""
+        n = len(self.ids)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            rows, tfs = self.postings[term]
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = self.k1 * (
+                1 - self.b + self.b * self.lengths[rows] / self.avg_length
+            )
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            return []
+
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def document(self, row):
+        return Document(
+            id=self.ids[row], page_content=self.texts[row], metadata=self.metadatas[row]
+        )
+
+    def search_documents(self, query, k):
+        return [self.document(row) for row, _ in self.search(query, k)]
@@ -0,0 +1,98 @@
+# Reusable Playwright tabs + adaptive (AIMD) concurrency for the browser crawler
+import asyncio
+import time
+from config import BROWSER_MAX_TABS, BROWSER_MIN_TABS, BROWSER_TARGET_LATENCY
+
+# Wiki text lives in the document itself, everything else is wasted bandwidth
+BLOCKED_RESOURCES = {"image", "media", "font", "stylesheet"}
+
+
+async def block_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class PagePool:
+    """
+    Keeps browser tabs open between URLs instead of opening/closing one per page.
+    Tabs are created lazily, so the pool never holds more than the limiter allows.
+    """
+
+    def __init__(self, context):
+        self.context = context
+        self.idle = []
+        self.pages = []
+
+    async def acquire(self):
+        if self.idle:
+            return self.idle.pop()
+
+        page = await self.context.new_page()
+        self.pages.append(page)
+        return page
+
+    async def release(self, page, broken=False):
+        # A tab that errored may be in a weird state, replace it on next acquire
+        if broken:
+            self.pages.remove(page)
+            try:
+                await page.close()
+            except Exception:
+                pass
+        else:
+            self.idle.append(page)
+
+    async def close(self):
+        for page in self.pages:
+            try:
+                await page.close()
+            except Exception:
+                pass
+        self.pages, self.idle = [], []
+
+
+class AimdLimiter:
+    """
+    Concurrency limit that grows additively while pages load fast and without
+    errors, and halves when latency goes over target or a load fails (like TCP).
+    """
+
+    def __init__(
+        self,
+        initial=BROWSER_MIN_TABS,
+        minimum=BROWSER_MIN_TABS,
+        maximum=BROWSER_MAX_TABS,
+        target_latency=BROWSER_TARGET_LATENCY,
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency, ok):
+        async with self.cond:
+            self.in_flight -= 1
+            self.record(latency, ok)
+            self.cond.notify_all()
+
+    def record(self, latency, ok):
+        now = time.monotonic()
+        if not ok or latency > self.target_latency:
+            # Decrease at most once per target window, so one burst of slow
+            # responses doesn't collapse the limit to the minimum
+            if now - self.last_decrease > self.target_latency:
+                self.limit = max(self.minimum, self.limit / 2)
+                self.last_decrease = now
+        else:
+            # +1 tab per "round" of successful loads
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
@@ -0,0 +1,208 @@
+# Heading-aware Markdown chunker sized in model tokens
+import re
+from langchain_core.documents import Document
+from config import CHUNK_MAX_TOKENS, CHUNK_MIN_TOKENS
+from tokens import count_tokens
+
+HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_RE = re.compile(r"^\s*(```|~~~)")
+# html2text writes tables without outer pipes ("Pin| Use" / "---|---") and
+# <pre> as 4-space indented lines, so those count as well
+TABLE_DELIMITER_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)+\|?\s*$")
+INDENTED_RE = re.compile(r"^( {4}|\t)")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def parse_blocks(text):
+    """
+    Splits Markdown into (kind, text) blocks: "heading", "code" (whole fenced
+    or indented block), "table" (consecutive | rows) and "text" (paragraphs).
+    """
+    blocks, paragraph = [], []
+
+    def flush():
+        if paragraph:
+            blocks.append(("text", "\n".join(paragraph)))
+            paragraph.clear()
+
+    lines = text.split("\n")
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+
+        fence = FENCE_RE.match(line)
+        if fence:
+            flush()
+            end = i + 1
+            while end < len(lines) and not lines[end].lstrip().startswith(
+                fence.group(1)
+            ):
+                end += 1
+            blocks.append(("code", "\n".join(lines[i : end + 1])))
+            i = end + 1
+            continue
+
+        if line.lstrip().startswith("|") or (
+            "|" in line
+            and i + 1 < len(lines)
+            and TABLE_DELIMITER_RE.match(lines[i + 1])
+        ):
+            flush()
+            end = i + 1
+            while end < len(lines) and "|" in lines[end] and lines[end].strip():
+                end += 1
+            blocks.append(("table", "\n".join(lines[i:end])))
+            i = end
+            continue
+
+        # Indented code only starts a block, inside a paragraph it's a continuation
+        if not paragraph and line.strip() and INDENTED_RE.match(line):
+            flush()
+            end = i
+            while end < len(lines) and (
+                INDENTED_RE.match(lines[end]) or not lines[end].strip()
+            ):
+                end += 1
+            # Trailing blank lines belong to the gap after the block
+            while not lines[end - 1].strip():
+                end -= 1
+            blocks.append(("code", "\n".join(lines[i:end])))
+            i = end
+            continue
+
+        if HEADING_RE.match(line):
+            flush()
+            blocks.append(("heading", line.strip()))
+        elif line.strip():
+            paragraph.append(line)
+        else:
+            flush()
+        i += 1
+
+    flush()
+    return blocks
+
+
+def split_oversized(kind, text, max_tokens):
+    """
+    Pieces of a block that alone exceeds max_tokens: tables by rows (repeating
+    the header), code by lines (re-opening the fence), prose by sentences.
+    """
+    if kind == "table":
+        lines = text.split("\n")
+        header, rows = lines[:2], lines[2:]
+        units, prefix, suffix = rows, "\n".join(header) + "\n", ""
+    elif kind == "code" and not FENCE_RE.match(text):
+        units, prefix, suffix = text.split("\n"), "", ""
+    elif kind == "code":
+        lines = text.split("\n")
+        fence = lines[0]
+        body = (
+            lines[1:-1] if len(lines) > 1 and FENCE_RE.match(lines[-1]) else lines[1:]
+        )
+        units, prefix, suffix = body, fence + "\n", "\n" + fence.strip()[:3]
+    else:
+        units, prefix, suffix = SENTENCE_RE.split(text), "", ""
+
+    sep = "\n" if kind in ("table", "code") else " "
+    budget = max_tokens - count_tokens(prefix + suffix)
+
+    pieces, current, current_tokens = [], [], 0
+    for unit in units:
+        tokens = count_tokens(unit)
+        if current and current_tokens + tokens > budget:
+            pieces.append(prefix + sep.join(current) + suffix)
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        pieces.append(prefix + sep.join(current) + suffix)
+    return pieces
+
+
+class MarkdownChunker:
+    """
+    Splits Markdown documents along their heading hierarchy into chunks of at
+    most max_tokens. Tables and code blocks stay whole unless they alone
+    exceed the budget. Sections smaller than min_tokens are merged into the
+    next one instead of becoming tiny chunks. No overlap: every chunk carries
+    its heading path instead, as metadata and as a first line when the chunk
+    starts mid-section.
+    """
+
+    def __init__(self, max_tokens=CHUNK_MAX_TOKENS, min_tokens=CHUNK_MIN_TOKENS):
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+
+    def sections(self, text):
+        """Yields (heading path, [(kind, text, tokens)]) per heading section."""
+        path, blocks = [], []
+        for kind, block in parse_blocks(text):
+            if kind == "heading":
+                if blocks:
+                    yield list(path), blocks
+                level, title = HEADING_RE.match(block).groups()
+                # Skipped levels (# then ###) are kept as empty slots
+                parents = path[: len(level) - 1]
+                path = parents + [""] * (len(level) - 1 - len(parents)) + [title]
+                blocks = []
+            tokens = count_tokens(block)
+            if tokens > self.max_tokens and kind != "heading":
+                blocks += [
+                    (kind, piece, count_tokens(piece))
+                    for piece in split_oversized(kind, block, self.max_tokens)
+                ]
+            else:
+                blocks.append((kind, block, tokens))
+        if blocks:
+            yield list(path), blocks
+
+    def split_text(self, text):
+        """Returns [(heading path, chunk text)]."""
+        chunks = []
+        path, parts, tokens = None, [], 0
+
+        def flush():
+            if parts:
+                chunks.append((path, "\n\n".join(parts)))
+
+        for section_path, blocks in self.sections(text):
+            # Small sections are merged into the following one
+            if parts and tokens >= self.min_tokens:
+                flush()
+                path, parts, tokens = None, [], 0
+
+            last_kind = None
+            for kind, block, block_tokens in blocks:
+                if parts and tokens + block_tokens > self.max_tokens:
+                    # A heading moves along with its first block
+                    heading = parts.pop() if last_kind == "heading" else None
+                    flush()
+                    breadcrumb = heading or " > ".join(p for p in section_path if p)
+                    parts = [breadcrumb] if breadcrumb else []
+                    tokens = count_tokens(breadcrumb) if breadcrumb else 0
+                    path = None
+                if path is None:
+                    path = section_path
+                parts.append(block)
+                tokens += block_tokens
+                last_kind = kind
+
+        flush()
+        return chunks
+
+    def iter_chunks(self, documents):
+        """Streams chunk Documents, with `headings` and `chunk_index` metadata."""
+        for doc in documents:
+            for index, (path, text) in enumerate(self.split_text(doc.page_content)):
+                yield Document(
+                    page_content=text,
+                    metadata={
+                        **doc.metadata,
+                        "headings": " > ".join(p for p in path if p),
+                        "chunk_index": index,
+                    },
+                )
+
+    def split_documents(self, documents):
+        return list(self.iter_chunks(documents))
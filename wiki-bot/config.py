@@ -7,3 +7,58 @@ DB_PATH = "./chroma_db"
 WIKI_URL = "https://wiki.hyperloopupv.com"
 COOKIES_FILE = "cookies.json"
 MODEL_NAME = "gpt-5-nano"
+EMBEDDING_MODEL = "text-embedding-ada-002"
+MANIFEST_FILE = "crawl_manifest.json"
+CRAWL_BACKEND = "graphql"  # "graphql" or "browser"
+GRAPHQL_CONCURRENCY = 20
+EXTRACT_WORKERS = None  # None = one worker per CPU core
+INDEX_BATCH_SIZE = 256  # chunks embedded + written per Chroma call
+INDEX_QUEUE_SIZE = 4  # batches buffered between chunking and indexing
+BROWSER_MIN_TABS = 2
+BROWSER_MAX_TABS = 20
+BROWSER_TARGET_LATENCY = 5.0  # seconds per page load before backing off
+CRAWL_CACHE_PATH = "crawl_cache.sqlite"
+CRAWL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+FRONTIER_CONCURRENCY = 16
+FRONTIER_PER_HOST = 8  # parallel requests per host
+FRONTIER_DELAY = 0.05  # seconds between request starts on the same host
+FRONTIER_RETRIES = 3
+DEDUP_PAGE_THRESHOLD = 0.9  # estimated Jaccard similarity of two pages' shingles
+DEDUP_SIMHASH_DISTANCE = 3  # max differing bits between near-duplicate chunks
+BOILERPLATE_MIN_PAGES = 3  # paragraphs on more pages than this are boilerplate
+DEDUP_STATE_PATH = "dedup_state.json"  # page signatures + blocks between crawls
+EMBEDDING_CACHE_PATH = "embedding_cache.sqlite"
+EMBEDDING_CACHE_MAX_ENTRIES = 500_000
+EMBEDDING_CACHE_MEMORY_ENTRIES = 2048
+EMBEDDING_BATCH_TOKENS = 50_000  # tokens per embeddings request
+EMBEDDING_MAX_BATCH_SIZE = 2048  # inputs per embeddings request (API limit)
+EMBEDDING_CONCURRENCY = 4  # requests in flight
+EMBEDDING_MAX_RETRIES = 6
+VECTOR_BACKEND = "chroma"  # "chroma" or "numpy" (read-only export of Chroma)
+NUMPY_QUANTIZED = True  # int8 rows + float32 scale instead of float32 rows
+NUMPY_IVF_MIN_ROWS = 20_000  # switch to IVF (k-means partitions) from this size
+NUMPY_IVF_NPROBE = 8  # partitions scanned per query
+RETRIEVAL_MODE = "hybrid"  # "dense" or "hybrid" (dense + BM25, fused with RRF)
+RETRIEVAL_K = 5  # chunks handed to the summarizer
+HYBRID_FETCH_K = 20  # candidates taken from each retriever before fusion
+RRF_K = 60  # reciprocal rank fusion damping constant
+BM25_K1 = 1.5
+BM25_B = 0.75
+REPHRASE_QUERY = True  # False: retrieve on the raw query, skipping one LLM call
+CHUNK_MAX_TOKENS = 400  # chunk budget in embedding-model tokens
+CHUNK_MIN_TOKENS = 100  # smaller heading sections merge into the next one
+MMR_LAMBDA = 0.7  # 1.0 = pure relevance, lower = more diverse context
+CONTEXT_MAX_TOKENS = 2000  # retrieved context budget for the summarizer prompt
+ANSWER_CACHE_PATH = "answer_cache.sqlite"
+ANSWER_CACHE_THRESHOLD = 0.95  # min cosine similarity between two queries
+ANSWER_CACHE_TTL = 7 * 24 * 3600  # seconds
+ANSWER_CACHE_MAX_ENTRIES = 10_000
+LLM_CACHE_ENABLED = True  # False bypasses the response cache in call_llm
+LLM_CACHE_PATH = "llm_cache.sqlite"
+LLM_CACHE_TTL = 30 * 24 * 3600  # seconds
+LLM_CACHE_MAX_ENTRIES = 50_000
+LLM_MAX_RETRIES = 2  # chat calls, on rate limits / connection / 5xx errors
+BATCH_CONCURRENCY = 16  # questions in flight in batch.py
+INDEX_MAX_AGE = 7 * 24 * 3600  # seconds before /health reports the index as stale
+METRICS_ENABLED = False  # record latency / token / cache metrics (api: /metrics)
+METRICS_SUMMARY_PATH = "metrics.json"  # JSON summary written at exit when enabled
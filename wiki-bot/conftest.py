@@ -0,0 +1,19 @@
+import os
+import pytest
+from chromadb.api.client import SharedSystemClient
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+
+@pytest.fixture
+def vector_store(tmp_path, monkeypatch):
+    """The vector_store module on an empty store in tmp_path, with fake embeddings."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "test"))
+    import llm
+    import vector_store
+
+    monkeypatch.setattr(llm.embeddings, "base", DeterministicFakeEmbedding(size=32))
+    monkeypatch.setattr(vector_store, "_stores", {})
+    # chromadb caches clients by the (relative) path: not another test's store
+    SharedSystemClient.clear_system_cache()
+    return vector_store
@@ -0,0 +1,177 @@
+# Content-addressed on-disk cache of raw HTML + extracted Markdown
+import hashlib
+import sqlite3
+import time
+import zlib
+from langchain_core.documents import Document
+from config import CRAWL_CACHE_MAX_BYTES, CRAWL_CACHE_PATH
+
+
+def make_document(url, title, markdown_content):
+    return Document(
+        page_content=f"# {title}\nURL: {url}\n\n{markdown_content}",
+        metadata={"source": url, "title": title},
+    )
+
+
+def content_hash(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+class CrawlCache:
+    """
+    Two tables: `blobs` stores HTML + Markdown once per content hash, `pages`
+    maps each URL (and the Wiki.js version it was fetched at) to a blob.
+    Least recently used blobs are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, path=CRAWL_CACHE_PATH, max_bytes=CRAWL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                html BLOB NOT NULL,
+                markdown TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                version TEXT,
+                hash TEXT NOT NULL,
+                title TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            """)
+        self.size = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs"
+        ).fetchone()[0]
+
+    def get(self, url, version):
+        """Returns the cached Document for `url` if it was fetched at `version`."""
+        if version is None:
+            return None
+
+        row = self.db.execute(
+            "SELECT p.title, p.hash, b.markdown FROM pages p "
+            "JOIN blobs b ON b.hash = p.hash WHERE p.url = ? AND p.version = ?",
+            (url, version),
+        ).fetchone()
+        if row is None:
+            return None
+
+        title, digest, markdown = row
+        self.touch(digest)
+        return make_document(url, title, markdown)
+
+    def markdown_for(self, html):
+        """Markdown previously extracted from byte-identical HTML, if any."""
+        digest = content_hash(html)
+        row = self.db.execute(
+            "SELECT markdown FROM blobs WHERE hash = ?", (digest,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.touch(digest)
+        return row[0]
+
+    def put(self, url, title, html, markdown, version=None):
+        digest = content_hash(html)
+        compressed = zlib.compress(html.encode("utf-8"))
+        size = len(compressed) + len(markdown.encode("utf-8"))
+
+        cursor = self.db.execute(
+            "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?)",
+            (digest, compressed, markdown, size, time.time()),
+        )
+        if cursor.rowcount:
+            self.size += size
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+            (url, version, digest, title, time.time()),
+        )
+        self.db.commit()
+
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def touch(self, digest):
+        self.db.execute(
+            "UPDATE blobs SET accessed_at = ? WHERE hash = ?", (time.time(), digest)
+        )
+        self.db.commit()
+
+    def evict(self, max_bytes=None):
+        """Drops least recently used blobs (and their pages) until under max_bytes."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+
+        rows = self.db.execute(
+            "SELECT hash, size FROM blobs ORDER BY accessed_at"
+        ).fetchall()
+
+        evicted = []
+        for digest, size in rows:
+            if self.size <= max_bytes:
+                break
+            evicted.append((digest,))
+            self.size -= size
+
+        self.db.executemany("DELETE FROM pages WHERE hash = ?", evicted)
+        self.db.executemany("DELETE FROM blobs WHERE hash = ?", evicted)
+        self.db.commit()
+        return len(evicted)
+
+    def delete(self, urls):
+        """Drops the pages of `urls`, and each blob once no other page uses it."""
+        removed = 0
+        for url in urls:
+            row = self.db.execute(
+                "SELECT hash FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                continue
+            self.db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            removed += 1
+
+            orphan = self.db.execute(
+                "SELECT size FROM blobs WHERE hash = ? "
+                "AND NOT EXISTS (SELECT 1 FROM pages WHERE hash = ?)",
+                (row[0], row[0]),
+            ).fetchone()
+            if orphan:
+                self.db.execute("DELETE FROM blobs WHERE hash = ?", (row[0],))
+                self.size -= orphan[0]
+        self.db.commit()
+        return removed
+
+    def urls(self):
+        return [url for (url,) in self.db.execute("SELECT url FROM pages")]
+
+    def html_for(self, url):
+        row = self.db.execute(
+            "SELECT b.html FROM pages p JOIN blobs b ON b.hash = p.hash WHERE p.url = ?",
+            (url,),
+        ).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def iter_documents(self):
+        """Every cached page as a Document, e.g. to rebuild the index offline."""
+        rows = self.db.execute(
+            "SELECT p.url, p.title, b.markdown FROM pages p "
+            "JOIN blobs b ON b.hash = p.hash ORDER BY p.url"
+        )
+        for url, title, markdown in rows:
+            yield make_document(url, title, markdown)
+
+    async def aiter_documents(self):
+        for doc in self.iter_documents():
+            yield doc
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self):
+        self.db.close()
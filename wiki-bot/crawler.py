@@ -2,20 +2,32 @@ import asyncio
 import json
 import os
 import sys
+import time
 from typing import List
-import html2text
 from playwright.async_api import async_playwright
 from playwright.sync_api import sync_playwright
+import httpx
 import requests
-from langchain_community.document_loaders import RecursiveUrlLoader
-from bs4 import BeautifulSoup as Soup
 from langchain_core.documents import Document
-from config import COOKIES_FILE, WIKI_URL
+from config import (
+    BROWSER_MAX_TABS,
+    COOKIES_FILE,
+    CRAWL_BACKEND,
+    GRAPHQL_CONCURRENCY,
+    WIKI_URL,
+)
 from auth_cli import login_and_save_cookies
+from browser_pool import AimdLimiter, PagePool, block_resources
+from crawl_cache import make_document
+from extract import get_converter, html_to_markdown, make_extract_pool
+from frontier import crawl_site
 from logger import log_node
 
 
-def get_all_wiki_paths(base_url, cookies_list):
+def get_all_wiki_pages(base_url, cookies_list):
+    """
+    Lists every page known to Wiki.js with the fields needed for incremental crawls.
+    """
     # Convert cookie list to dict for requests
     cookies = {c["name"]: c["value"] for c in cookies_list}
 
@@ -24,8 +36,11 @@ def get_all_wiki_paths(base_url, cookies_list):
     {
       pages {
         list (orderBy: TITLE) {
+          id
           path
+          locale
           title
+          updatedAt
         }
       }
     }
@@ -48,113 +63,362 @@ def get_all_wiki_paths(base_url, cookies_list):
     try:
         data = response.json()
         pages = data["data"]["pages"]["list"]
-        # Return full URLs
-        return [f"{base_url}/{p['path']}" for p in pages]
+        # Attach full URLs
+        return [{**p, "url": f"{base_url}/{p['path']}"} for p in pages]
     except Exception as e:
         print(f"Failed to parse API response: {e}")
         return []
 
 
-with open(COOKIES_FILE) as f:
-    cookie_list = json.load(f)
+def get_all_wiki_paths(base_url, cookies_list):
+    return [p["url"] for p in get_all_wiki_pages(base_url, cookies_list)]
 
 
-urls = get_all_wiki_paths(WIKI_URL, cookie_list)
+_DONE = object()
 
 
-async def scrape_single_page(context, url, sem):
+async def bounded_map(func, items, concurrency, buffer=None):
     """
-    Scrapes a single page asynchronously with semaphore limiting.
+    Runs the async `func` over `items` with `concurrency` workers and yields
+    results as they finish. Workers block once `buffer` results are waiting
+    to be consumed, so a slow consumer slows the producers down (backpressure).
     """
-    async with sem:  # Controls how many tabs open at once (max 10)
-        page = None
+    items = iter(items)
+    results = asyncio.Queue(maxsize=buffer or concurrency)
+
+    async def worker():
         try:
-            page = await context.new_page()
+            # The iterator is shared: each worker pulls the next item when free
+            for item in items:
+                await results.put(await func(item))
+        except Exception as e:
+            await results.put(e)
+        await results.put(_DONE)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < concurrency:
+            result = await results.get()
+            if result is _DONE:
+                finished += 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
 
-            await page.goto(url, timeout=30000)
-            try:
-                await page.wait_for_load_state("networkidle", timeout=5000)
-            except:
-                print(f"Timeout waiting for content on {url}")
-                await asyncio.sleep(2)
 
-            title = await page.title()
+async def extract_document(url, title, full_html, pool, cache=None, version=None):
+    """
+    Converts fetched HTML to a Document. The conversion is CPU-bound, so it runs
+    in the process pool (off the event loop) unless the cache already has
+    Markdown for byte-identical HTML.
+    """
+    markdown_content = cache.markdown_for(full_html) if cache is not None else None
 
-            if "Page Not Found" in title or "404" in title:
-                print(f"Skipping 404/Not Found: {url}")
-                await page.close()
-                return None
+    if markdown_content is None:
+        try:
+            loop = asyncio.get_running_loop()
+            markdown_content = await loop.run_in_executor(
+                pool, html_to_markdown, full_html
+            )
+        except Exception as e:
+            print(f"Failed to extract {url}: {e}")
+            return None
 
-            full_html = await page.content()
+    if cache is not None:
+        cache.put(url, title, full_html, markdown_content, version)
 
-            await page.close()
+    return make_document(url, title, markdown_content)
 
-            # 2. Filter with BeautifulSoup (Reliable)
-            soup = Soup(full_html, "html.parser")
 
-            for element in soup(["script", "style", "svg", "noscript"]):
-                element.extract()
+async def scrape_single_page(tabs, url, limiter, pool, cache=None, version=None):
+    """
+    Scrapes a single page in a pooled tab, with the AIMD limiter deciding how
+    many tabs load at once. Markdown extraction runs in the process pool so the
+    tab is handed back as soon as the HTML is in.
+    """
+    await limiter.acquire()
+    page = None
+    start = time.monotonic()
+    latency = None
+    ok = False
+    try:
+        page = await tabs.acquire()
+        start = time.monotonic()
+        await page.goto(url, timeout=30000)
+        # The limiter sees the page load only: pages that never go network-idle
+        # (and the pause after that timeout) say nothing about server load
+        latency = time.monotonic() - start
+        try:
+            await page.wait_for_load_state("networkidle", timeout=5000)
+        except:
+            print(f"Timeout waiting for content on {url}")
+            await asyncio.sleep(2)
 
-            # Find Content
-            content_div = soup.select_one(".contents") or soup.body
+        title = await page.title()
+        ok = True
 
-            # Find Comments
-            comments_div = soup.select_one(".comments-main")
+        if "Page Not Found" in title or "404" in title:
+            print(f"Skipping 404/Not Found: {url}")
+            return None
 
-            # Construct clean HTML
-            clean_html = ""
-            if content_div:
-                clean_html += str(content_div)
+        full_html = await page.content()
 
-            if comments_div:
-                clean_html += "\n<hr><h2>Comments</h2>\n" + str(comments_div)
+    except Exception as e:
+        print(f"Failed {url}: {e}")
+        return None
+
+    finally:
+        if page:
+            await tabs.release(page, broken=not ok)
+        await limiter.release(
+            time.monotonic() - start if latency is None else latency, ok
+        )
 
-            # 3. Convert to Markdown
-            h = html2text.HTML2Text()
-            h.ignore_links = False
-            h.body_width = 0
-            markdown_content = h.handle(clean_html)
+    # 2. Filter + convert to Markdown
+    doc = await extract_document(url, title, full_html, pool, cache, version)
+    if doc is None:
+        return None
 
-            if "hardware" in url.lower() and "pcu" not in url.lower():
-                print(f"\n--- DEBUG MARKDOWN for {url} ---")
-                print(markdown_content)
-                print("--------------------------------\n")
+    if "hardware" in url.lower() and "pcu" not in url.lower():
+        print(f"\n--- DEBUG MARKDOWN for {url} ---")
+        print(doc.page_content)
+        print("--------------------------------\n")
 
-            print(f"Scraped: {'/'.join(url.split('/')[3:])}")
+    print(f"Scraped: {'/'.join(url.split('/')[3:])}")
 
-            return Document(
-                page_content=f"# {title}\nURL: {url}\n\n{markdown_content}",
-                metadata={"source": url, "title": title},
-            )
+    return doc
 
-        except Exception as e:
-            print(f"Failed {url}: {e}")
-            if page:
-                await page.close()
-            return None
 
+async def iter_wiki_pages_async(
+    target_urls, cookies_list, pool=None, cache=None, versions=None
+):
+    """
+    Async generator version of the browser crawl: yields Documents as soon as
+    they are scraped instead of holding the whole wiki in memory.
+    """
+    if pool is None:
+        with make_extract_pool() as pool:
+            async for doc in iter_wiki_pages_async(
+                target_urls, cookies_list, pool, cache, versions
+            ):
+                yield doc
+        return
 
-async def crawl_wiki_pages_async(target_urls, cookies_list):
     print(f"Starting async scrape of {len(target_urls)} pages...")
 
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         context = await browser.new_context()
         await context.add_cookies(cookies_list)
+        await context.route("**/*", block_resources)
+
+        # Adapts the number of loading tabs to how well the wiki keeps up,
+        # to avoid crashing the browser or getting banned
+        limiter = AimdLimiter()
+        tabs = PagePool(context)
+
+        # Twice as many workers as tabs so extraction overlaps with fetching
+        scraped = 0
+        async for doc in bounded_map(
+            lambda url: scrape_single_page(
+                tabs, url, limiter, pool, cache, (versions or {}).get(url)
+            ),
+            target_urls,
+            BROWSER_MAX_TABS * 2,
+        ):
+            if doc:
+                scraped += 1
+                yield doc
+
+        await tabs.close()
+        await browser.close()
+
+    print(
+        f"Finished! Successfully scraped {scraped}/{len(target_urls)} pages "
+        f"(final concurrency: {int(limiter.limit)} tabs)."
+    )
 
-        # Limit concurrency to avoid crashing the browser or getting banned
-        sem = asyncio.Semaphore(10)
 
-        tasks = [scrape_single_page(context, url, sem) for url in target_urls]
-        results = await asyncio.gather(*tasks)
+async def crawl_wiki_pages_async(target_urls, cookies_list, pool=None):
+    return [d async for d in iter_wiki_pages_async(target_urls, cookies_list, pool)]
 
-        await browser.close()
 
-        valid_docs = [r for r in results if r]
-        print(
-            f"Finished! Successfully scraped {len(valid_docs)}/{len(target_urls)} pages."
+RENDER_QUERY = """
+query ($id: Int!, $locale: String!, $path: String!) {
+  pages {
+    single (id: $id) {
+      title
+      render
+    }
+  }
+  comments {
+    list (locale: $locale, path: $path) {
+      render
+      authorName
+    }
+  }
+}
+"""
+
+
+async def fetch_page_graphql(client, page, sem, pool, cache=None):
+    """
+    Fetches the server-side rendered HTML of a page (and its comments) via GraphQL.
+    Returns None when the page has to be rendered in a browser instead.
+    """
+    url = page["url"]
+
+    async with sem:
+        try:
+            response = await client.post(
+                "/graphql",
+                json={
+                    "query": RENDER_QUERY,
+                    "variables": {
+                        "id": page["id"],
+                        "locale": page.get("locale") or "en",
+                        "path": page["path"],
+                    },
+                },
+            )
+            response.raise_for_status()
+            data = response.json().get("data") or {}
+        except Exception as e:
+            print(f"GraphQL fetch failed {url}: {e}")
+            return None
+
+    # Errors on the comments part still leave us a usable page
+    single = (data.get("pages") or {}).get("single")
+    if not single or not single.get("render"):
+        return None
+
+    comments = (data.get("comments") or {}).get("list") or []
+    comments_html = "".join(
+        f"<p><strong>{c.get('authorName', '')}</strong></p>{c.get('render') or ''}"
+        for c in comments
+    )
+
+    full_html = f'<div class="contents">{single["render"]}</div>'
+    if comments_html:
+        full_html += f'<div class="comments-main">{comments_html}</div>'
+
+    title = single.get("title") or page.get("title", "")
+    doc = await extract_document(
+        url, title, full_html, pool, cache, page.get("updatedAt")
+    )
+    if doc:
+        print(f"Fetched: {page['path']}")
+    return doc
+
+
+async def iter_wiki_pages_graphql(
+    pages, cookies_list, concurrency=GRAPHQL_CONCURRENCY, pool=None, cache=None
+):
+    """
+    Browser-free crawl: pulls rendered pages straight from the Wiki.js GraphQL API
+    over a pooled HTTP client. Pages GraphQL can't render fall back to Playwright.
+    Yields Documents as they are fetched.
+    """
+    if pool is None:
+        with make_extract_pool() as pool:
+            async for doc in iter_wiki_pages_graphql(
+                pages, cookies_list, concurrency, pool, cache
+            ):
+                yield doc
+        return
+
+    print(f"Starting GraphQL fetch of {len(pages)} pages...")
+
+    cookies = {c["name"]: c["value"] for c in cookies_list}
+    token = cookies.get("token") or cookies.get("jwt")
+
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+
+    async def fetch(page):
+        return page, await fetch_page_graphql(client, page, sem, pool, cache)
+
+    fetched = 0
+    fallback_urls = []
+    versions = {p["url"]: p.get("updatedAt") for p in pages}
+
+    async with httpx.AsyncClient(
+        base_url=WIKI_URL,
+        cookies=cookies,
+        headers={"Authorization": f"Bearer {token}"},
+        limits=limits,
+        timeout=30,
+    ) as client:
+        async for page, doc in bounded_map(fetch, pages, concurrency * 2):
+            if doc:
+                fetched += 1
+                yield doc
+            else:
+                fallback_urls.append(page["url"])
+
+    if fallback_urls:
+        print(f"Falling back to the browser for {len(fallback_urls)} pages...")
+        async for doc in iter_wiki_pages_async(
+            fallback_urls, cookies_list, pool, cache, versions
+        ):
+            fetched += 1
+            yield doc
+
+    print(f"Finished! Fetched {fetched}/{len(pages)} pages.")
+
+
+async def crawl_wiki_pages_graphql(
+    pages, cookies_list, concurrency=GRAPHQL_CONCURRENCY, pool=None
+):
+    return [
+        d async for d in iter_wiki_pages_graphql(pages, cookies_list, concurrency, pool)
+    ]
+
+
+async def iter_pages(pages, cookies_list, backend=CRAWL_BACKEND, cache=None):
+    """
+    Streams the given page list through the configured backend ("graphql" or "browser").
+    Pages already cached at their current Wiki.js version are served from the cache.
+    """
+    if cache is not None:
+        misses = []
+        for page in pages:
+            doc = cache.get(page["url"], page.get("updatedAt"))
+            if doc:
+                yield doc
+            else:
+                misses.append(page)
+        print(f"Crawl cache: {len(pages) - len(misses)} hits, {len(misses)} misses.")
+        pages = misses
+
+    if not pages:
+        return
+
+    if backend == "graphql":
+        crawl = iter_wiki_pages_graphql(pages, cookies_list, cache=cache)
+    else:
+        crawl = iter_wiki_pages_async(
+            [p["url"] for p in pages],
+            cookies_list,
+            cache=cache,
+            versions={p["url"]: p.get("updatedAt") for p in pages},
         )
-        return valid_docs
+
+    async for doc in crawl:
+        yield doc
+
+
+async def crawl_pages(pages, cookies_list, backend=CRAWL_BACKEND, cache=None):
+    """Crawls the given page list with the configured backend ("graphql" or "browser")."""
+    return [d async for d in iter_pages(pages, cookies_list, backend, cache)]
 
 
 # Wrapper to run it synchronously
@@ -215,10 +479,7 @@ def crawl_wiki_pages(target_urls: List[str], cookies_list: List[dict]):
                     full_html += f"\n<hr>\n<h2>Comments</h2>\n{comments_html}"
 
                 # 3. Convert to Markdown
-                h = html2text.HTML2Text()
-                h.ignore_links = False
-                h.body_width = 0  # Don't wrap lines
-                markdown_content = h.handle(full_html)
+                markdown_content = get_converter().handle(full_html)
 
                 # 4. Enrich Content
                 enriched_content = f"# {title}\nURL: {url}\n\n{markdown_content}"
@@ -256,20 +517,14 @@ def load_data_with_retry():
                 cookies = get_cookies_dict()
 
             print(f"Loading pages... (Attempt {attempt+1})")
-            loader = RecursiveUrlLoader(
-                url=WIKI_URL,
-                max_depth=10,
-                extractor=lambda x: Soup(x, "html.parser").text,
-                headers={
-                    "Cookie": "; ".join([f"{k}={v}" for k, v in cookies.items()]),
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                },
-            )
-            data = loader.load()
-
-            # Simple check: if data is empty or looks like a login page, raise error
-            if not data or "Sign in to your account" in data[0].page_content:
-                raise Exception("Auth failed (Login page detected)")
+            cookie_list = [{"name": k, "value": v} for k, v in cookies.items()]
+            seeds = [WIKI_URL] + get_all_wiki_paths(WIKI_URL, cookie_list)
+            data = asyncio.run(crawl_site(seeds, cookies, WIKI_URL, max_depth=10))
+
+            # Login pages are caught on the first response (AuthError),
+            # an empty walk still means something is off
+            if not data:
+                raise Exception("Auth failed (no pages loaded)")
 
             return data
 
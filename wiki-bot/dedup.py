@@ -0,0 +1,255 @@
+# Near-duplicate page/chunk detection and boilerplate stripping before embedding
+import json
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+import numpy as np
+from config import (
+    BOILERPLATE_MIN_PAGES,
+    DEDUP_PAGE_THRESHOLD,
+    DEDUP_STATE_PATH,
+    DEDUP_SIMHASH_DISTANCE,
+)
+from tokens import count_tokens
+
+MERSENNE_PRIME = (1 << 31) - 1
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: candidates from ~0.5 Jaccard, verified after
+SHINGLE_SIZE = 5
+
+WORD_RE = re.compile(r"\w+")
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+def stable_hash(text):
+    # Python's hash() is salted per process, crc32 is stable across runs
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=42):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.int64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.int64)
+
+    def signature(self, text):
+        tokens = words(text)
+        shingles = {
+            " ".join(tokens[i : i + SHINGLE_SIZE])
+            for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))
+        }
+        x = np.fromiter(
+            (stable_hash(s) % MERSENNE_PRIME for s in shingles), dtype=np.int64
+        )
+        # (num_perm, n_shingles) -> min over shingles, all in one vectorized pass
+        return ((np.outer(self.a, x) + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+
+def simhash(text):
+    """64-bit SimHash over word tokens."""
+    tokens = words(text)
+    if not tokens:
+        return 0
+
+    counts = Counter(tokens)
+    hashes = np.fromiter(
+        (stable_hash(t) | (stable_hash(t[::-1] + "#") << 32) for t in counts),
+        dtype=np.uint64,
+    )
+    weights = np.fromiter(counts.values(), dtype=np.int64)
+
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    votes = (np.where(bits == 1, 1, -1) * weights[:, None]).sum(axis=0)
+
+    return int(np.packbits(votes[::-1] > 0).view(">u8")[0])
+
+
+class Deduplicator:
+    """
+    Streaming dedup stage:
+    - pages: MinHash + LSH banding, pages whose estimated Jaccard similarity to
+      an already kept page is >= DEDUP_PAGE_THRESHOLD are dropped
+    - boilerplate: paragraphs seen on BOILERPLATE_MIN_PAGES pages are stripped
+      from every page after that
+    - chunks: exact duplicates and SimHash neighbours (Hamming distance <=
+      DEDUP_SIMHASH_DISTANCE, found via 4 x 16-bit pigeonhole tables) within
+      one page are dropped. Not across pages: the index is replaced per page,
+      so a chunk kept only by another page would vanish when that page changes
+
+    Page signatures and each page's blocks can be saved and loaded, so an
+    incremental run dedups against the whole wiki, not only its own pages.
+    A page that is processed again replaces its previous state.
+    """
+
+    def __init__(
+        self,
+        page_threshold=DEDUP_PAGE_THRESHOLD,
+        simhash_distance=DEDUP_SIMHASH_DISTANCE,
+        boilerplate_min_pages=BOILERPLATE_MIN_PAGES,
+    ):
+        self.page_threshold = page_threshold
+        self.simhash_distance = simhash_distance
+        self.boilerplate_min_pages = boilerplate_min_pages
+
+        self.minhasher = MinHasher()
+        self.signatures = {}
+        self.buckets = defaultdict(list)
+
+        self.block_pages = Counter()
+        self.page_blocks = {}  # source -> its block keys, for block_pages
+
+        self.chunk_hashes = {}
+        self.simhash_tables = [defaultdict(list) for _ in range(4)]
+
+        self.stats = Counter()
+
+    # State
+
+    def save(self, path=DEDUP_STATE_PATH):
+        state = {
+            "signatures": {s: sig.tolist() for s, sig in self.signatures.items()},
+            "page_blocks": self.page_blocks,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEDUP_STATE_PATH, **kwargs):
+        """A Deduplicator with the state saved by a previous run, if any."""
+        dedup = cls(**kwargs)
+        if not os.path.exists(path):
+            return dedup
+
+        with open(path) as f:
+            state = json.load(f)
+        for source, signature in state["signatures"].items():
+            dedup.add_signature(source, np.asarray(signature, dtype=np.int64))
+        for source, keys in state["page_blocks"].items():
+            dedup.page_blocks[source] = keys
+            dedup.block_pages.update(keys)
+        return dedup
+
+    def forget(self, source):
+        """Drops a page's signature and blocks, e.g. once it's deleted from the wiki."""
+        signature = self.signatures.pop(source, None)
+        if signature is not None:
+            for key in self.band_keys(signature):
+                self.buckets[key].remove(source)
+        self.block_pages.subtract(self.page_blocks.pop(source, []))
+
+    # Pages
+
+    def band_keys(self, signature):
+        rows = NUM_PERM // BANDS
+        return [
+            (band, signature[band * rows : (band + 1) * rows].tobytes())
+            for band in range(BANDS)
+        ]
+
+    def add_signature(self, source, signature):
+        self.signatures[source] = signature
+        for key in self.band_keys(signature):
+            self.buckets[key].append(source)
+
+    def duplicate_page_of(self, doc):
+        signature = self.minhasher.signature(doc.page_content)
+        keys = self.band_keys(signature)
+
+        candidates = {source for key in keys for source in self.buckets[key]}
+        for source in candidates:
+            if np.mean(self.signatures[source] == signature) >= self.page_threshold:
+                return source
+
+        self.add_signature(doc.metadata["source"], signature)
+        return None
+
+    def strip_boilerplate(self, doc):
+        blocks = doc.page_content.split("\n\n")
+        keys = [stable_hash(" ".join(words(block))) for block in blocks]
+
+        # Document frequency: each block counts once per page
+        self.page_blocks[doc.metadata["source"]] = list(set(keys))
+        self.block_pages.update(set(keys))
+
+        kept = []
+        for block, key in zip(blocks, keys):
+            # Headings structure the page, keep them even if they repeat
+            is_heading = block.lstrip().startswith("#")
+            if (
+                self.block_pages[key] > self.boilerplate_min_pages
+                and not is_heading
+                and words(block)
+            ):
+                self.stats["boilerplate_blocks"] += 1
+                self.stats["tokens_saved"] += count_tokens(block)
+            else:
+                kept.append(block)
+
+        doc.page_content = "\n\n".join(kept)
+        return doc
+
+    def filter_page(self, doc):
+        """Returns the cleaned Document, or None if it duplicates a kept page."""
+        self.stats["pages"] += 1
+        # A new version of the page must not match (or count) the old one
+        self.forget(doc.metadata["source"])
+
+        original = self.duplicate_page_of(doc)
+        if original:
+            self.stats["duplicate_pages"] += 1
+            self.stats["tokens_saved"] += count_tokens(doc.page_content)
+            print(f"Skipping near-duplicate of {original}: {doc.metadata['source']}")
+            return None
+
+        return self.strip_boilerplate(doc)
+
+    # Chunks
+
+    def is_duplicate_chunk(self, text):
+        exact = stable_hash(" ".join(words(text)))
+        if exact in self.chunk_hashes:
+            return True
+
+        fingerprint = simhash(text)
+        blocks = [(fingerprint >> (16 * i)) & 0xFFFF for i in range(4)]
+
+        # Any fingerprint within distance 3 shares at least one 16-bit block
+        for table, block in zip(self.simhash_tables, blocks):
+            for other in table[block]:
+                if (fingerprint ^ other).bit_count() <= self.simhash_distance:
+                    return True
+
+        self.chunk_hashes[exact] = fingerprint
+        for table, block in zip(self.simhash_tables, blocks):
+            table[block].append(fingerprint)
+        return False
+
+    def filter_chunks(self, chunks):
+        """Drops repeats among one page's chunks."""
+        self.chunk_hashes = {}
+        self.simhash_tables = [defaultdict(list) for _ in range(4)]
+
+        kept = []
+        for chunk in chunks:
+            self.stats["chunks"] += 1
+            if self.is_duplicate_chunk(chunk.page_content):
+                self.stats["duplicate_chunks"] += 1
+                self.stats["tokens_saved"] += count_tokens(chunk.page_content)
+            else:
+                kept.append(chunk)
+        return kept
+
+    def report(self):
+        s = self.stats
+        return (
+            f"Dedup: dropped {s['duplicate_pages']}/{s['pages']} pages, "
+            f"{s['duplicate_chunks']}/{s['chunks']} chunks and "
+            f"{s['boilerplate_blocks']} boilerplate blocks, "
+            f"saving ~{s['tokens_saved']} tokens"
+        )
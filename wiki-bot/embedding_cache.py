@@ -0,0 +1,180 @@
+# Persistent embedding cache in front of the embeddings API
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import metrics
+from config import (
+    EMBEDDING_CACHE_MAX_ENTRIES,
+    EMBEDDING_CACHE_MEMORY_ENTRIES,
+    EMBEDDING_CACHE_PATH,
+)
+
+# SQLite's default limit on "?" parameters per statement
+SQL_BATCH = 500
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings instance with a two-level cache keyed by
+    model name + text hash: an in-memory LRU for hot texts (repeated queries)
+    backed by SQLite on disk (float32 blobs). Only texts missing from both are
+    sent to the API, in one batch. The disk cache is trimmed to max_entries,
+    least recently used first.
+    """
+
+    def __init__(
+        self,
+        base,
+        model_name,
+        path=EMBEDDING_CACHE_PATH,
+        max_entries=EMBEDDING_CACHE_MAX_ENTRIES,
+        memory_entries=EMBEDDING_CACHE_MEMORY_ENTRIES,
+    ):
+        self.base = base
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # Chroma embeds from worker threads, so share one connection behind a lock
+        self.lock = threading.Lock()
+        self.path = path
+        self._db = None
+
+    @property
+    def db(self):
+        """Connected on first use, not when llm.py builds the instance at import."""
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS embeddings_accessed ON embeddings (accessed_at)"
+            )
+            self._db = db
+        return self._db
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def lookup(self, keys):
+        """Returns {key: vector} for every key found in memory or on disk."""
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+
+            # Memory hits skip SQLite entirely, only disk hits refresh accessed_at
+            missing = [k for k in set(keys) if k not in found]
+            from_disk = []
+            for i in range(0, len(missing), SQL_BATCH):
+                batch = missing[i : i + SQL_BATCH]
+                rows = self.db.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN "
+                    f"({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    found[key] = vector
+                    from_disk.append(key)
+                    self.remember(key, vector)
+
+            if from_disk:
+                now = time.time()
+                self.db.executemany(
+                    "UPDATE embeddings SET accessed_at = ? WHERE key = ?",
+                    [(now, k) for k in from_disk],
+                )
+                self.db.commit()
+        return found
+
+    def store(self, items):
+        with self.lock:
+            now = time.time()
+            self.db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [
+                    (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                    for key, vector in items
+                ],
+            )
+            for key, vector in items:
+                self.remember(key, vector)
+            self.db.commit()
+            self.evict()
+
+    def evict(self):
+        count = self.db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self.db.commit()
+
+    def split(self, texts):
+        keys = [self.key(t) for t in texts]
+        found = self.lookup(keys)
+
+        # Unique missing texts, so duplicates in one batch are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+
+        misses = sum(1 for k in keys if k not in found)
+        self.hits += len(keys) - misses
+        self.misses += misses
+        metrics.inc("embedding_cache_hits_total", len(keys) - misses)
+        metrics.inc("embedding_cache_misses_total", misses)
+        return keys, found, missing
+
+    def embed_documents(self, texts):
+        keys, found, missing = self.split(texts)
+        if missing:
+            vectors = self.base.embed_documents(list(missing.values()))
+            new = list(zip(missing.keys(), vectors))
+            self.store(new)
+            found.update(new)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        keys, found, missing = self.split(texts)
+        if missing:
+            vectors = await self.base.aembed_documents(list(missing.values()))
+            new = list(zip(missing.keys(), vectors))
+            self.store(new)
+            found.update(new)
+        return [found[k] for k in keys]
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
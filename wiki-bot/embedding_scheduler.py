@@ -0,0 +1,220 @@
+# Token-budgeted, rate-limit aware batch embedding over the async OpenAI API
+import asyncio
+import re
+import threading
+import time
+import openai
+from langchain_core.embeddings import Embeddings
+from config import (
+    EMBEDDING_BATCH_TOKENS,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_MAX_RETRIES,
+    EMBEDDING_MODEL,
+)
+from logger import log_node, update_line
+import metrics
+from tokens import count_tokens, get_encoding
+
+# Per-input limit of the OpenAI embedding models
+MAX_INPUT_TOKENS = 8191
+
+DURATION_RE = re.compile(r"([\d.]+)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    """Parses OpenAI reset headers like "1s", "6m0s" or "20ms" into seconds."""
+    return sum(
+        float(amount) * DURATION_UNITS[unit]
+        for amount, unit in DURATION_RE.findall(value or "")
+    )
+
+
+def pack_batches(token_counts, max_tokens, max_size):
+    """Greedily groups input indices into batches under max_tokens / max_size."""
+    batches, batch, batch_tokens = [], [], 0
+    for i, tokens in enumerate(token_counts):
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) == max_size):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class TokenBudget:
+    """Tracks the remaining tokens-per-minute reported by the API response headers."""
+
+    def __init__(self):
+        self.remaining = None
+        self.reset_at = 0.0
+
+    def update(self, headers):
+        remaining = headers.get("x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            self.remaining = int(remaining)
+            reset = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+            self.reset_at = time.monotonic() + reset
+
+    def pause(self, seconds):
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, time.monotonic() + seconds)
+
+    async def wait_for(self, tokens):
+        while self.remaining is not None and self.remaining < tokens:
+            delay = self.reset_at - time.monotonic()
+            if delay <= 0:
+                self.remaining = None
+                break
+            await asyncio.sleep(delay)
+        if self.remaining is not None:
+            self.remaining -= tokens
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Embeds texts in token-budgeted batches, several batches in flight at once.
+    Backs off on 429s (Retry-After / reset headers) and slows down ahead of the
+    tokens-per-minute limit. All requests run on one background event loop, so
+    the async client and the rate-limit state are shared by sync and async callers.
+    """
+
+    def __init__(
+        self,
+        model=EMBEDDING_MODEL,
+        batch_tokens=EMBEDDING_BATCH_TOKENS,
+        max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+        concurrency=EMBEDDING_CONCURRENCY,
+        max_retries=EMBEDDING_MAX_RETRIES,
+    ):
+        self.model = model
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.budget = TokenBudget()
+        self.loop = None
+        self.client = None
+        self.lock = threading.Lock()
+        self.totals = {"chunks": 0, "tokens": 0, "seconds": 0.0}
+
+    def get_loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, daemon=True).start()
+                # No retries in the client, the scheduler handles them
+                self.client = openai.AsyncOpenAI(max_retries=0)
+                self.sem = asyncio.Semaphore(self.concurrency)
+        return self.loop
+
+    def prepare(self, text):
+        tokens = count_tokens(text)
+        encoding = get_encoding()
+        if tokens > MAX_INPUT_TOKENS and encoding is not None:
+            text = encoding.decode(encoding.encode(text)[:MAX_INPUT_TOKENS])
+            tokens = MAX_INPUT_TOKENS
+        return text, tokens
+
+    async def embed_batch(self, texts, tokens):
+        async with self.sem:
+            for attempt in range(self.max_retries + 1):
+                await self.budget.wait_for(tokens)
+                start = time.perf_counter()
+                try:
+                    raw = await self.client.embeddings.with_raw_response.create(
+                        model=self.model, input=texts
+                    )
+                except openai.RateLimitError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    metrics.inc("embedding_retries_total", reason="rate_limit")
+                    headers = e.response.headers
+                    wait = float(headers.get("retry-after") or 0) or parse_duration(
+                        headers.get("x-ratelimit-reset-tokens")
+                    )
+                    self.budget.pause(wait or 2**attempt)
+                except (openai.APIConnectionError, openai.InternalServerError):
+                    if attempt == self.max_retries:
+                        raise
+                    metrics.inc("embedding_retries_total", reason="connection")
+                    await asyncio.sleep(2**attempt)
+                else:
+                    self.budget.update(raw.headers)
+                    metrics.observe(
+                        "embedding_request_seconds", time.perf_counter() - start
+                    )
+                    metrics.inc("embedding_tokens_total", tokens)
+                    response = raw.parse()
+                    return [
+                        d.embedding
+                        for d in sorted(response.data, key=lambda d: d.index)
+                    ]
+
+    async def run(self, texts):
+        start = time.perf_counter()
+        prepared = [self.prepare(t) for t in texts]
+        batches = pack_batches(
+            [tokens for _, tokens in prepared], self.batch_tokens, self.max_batch_size
+        )
+
+        results = [None] * len(texts)
+        done = {"chunks": 0, "tokens": 0}
+
+        async def run_batch(indices):
+            batch_tokens = sum(prepared[i][1] for i in indices)
+            vectors = await self.embed_batch(
+                [prepared[i][0] for i in indices], batch_tokens
+            )
+            for i, vector in zip(indices, vectors):
+                results[i] = vector
+
+            done["chunks"] += len(indices)
+            done["tokens"] += batch_tokens
+            if len(batches) == 1:
+                return
+            elapsed = time.perf_counter() - start
+            update_line(
+                f"Embedded {done['chunks']}/{len(texts)} chunks "
+                f"({done['chunks'] / elapsed:.1f} chunks/s, "
+                f"{done['tokens'] / elapsed:.0f} tokens/s)"
+            )
+
+        await asyncio.gather(*[run_batch(b) for b in batches])
+
+        self.totals["chunks"] += done["chunks"]
+        self.totals["tokens"] += done["tokens"]
+        self.totals["seconds"] += time.perf_counter() - start
+        return results
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self.run(texts), self.get_loop())
+        return future.result()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        if not texts:
+            return []
+        future = asyncio.run_coroutine_threadsafe(self.run(texts), self.get_loop())
+        return await asyncio.wrap_future(future)
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+    def report(self):
+        t = self.totals
+        seconds = t["seconds"] or 1e-9
+        log_node(
+            "EMBEDDINGS",
+            {
+                "message": f"Embedded {t['chunks']} chunks / {t['tokens']} tokens "
+                f"({t['chunks'] / seconds:.1f} chunks/s, {t['tokens'] / seconds:.0f} tokens/s)"
+            },
+        )
@@ -0,0 +1,54 @@
+# CPU-bound HTML -> Markdown extraction, kept import-light so pool workers start fast
+import os
+from concurrent.futures import ProcessPoolExecutor
+import html2text
+from bs4 import BeautifulSoup as Soup
+from config import EXTRACT_WORKERS
+
+# One configured converter per process, reused for every page
+_converter = None
+
+
+def get_converter():
+    global _converter
+    if _converter is None:
+        h = html2text.HTML2Text()
+        h.ignore_links = False
+        h.body_width = 0  # Don't wrap lines
+        _converter = h
+    return _converter
+
+
+def make_extract_pool(max_workers=EXTRACT_WORKERS):
+    """Process pool sized to the host's cores, with the converter built once per worker."""
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(), initializer=get_converter
+    )
+
+
+def html_to_markdown(full_html):
+    """
+    Strips page chrome from Wiki.js HTML and converts the content + comments to Markdown.
+    """
+    # Filter with BeautifulSoup (Reliable)
+    soup = Soup(full_html, "html.parser")
+
+    for element in soup(["script", "style", "svg", "noscript"]):
+        element.extract()
+
+    # Find Content
+    content_div = soup.select_one(".contents") or soup.body
+
+    # Find Comments
+    comments_div = soup.select_one(".comments-main")
+
+    # Construct clean HTML
+    clean_html = ""
+    if content_div:
+        clean_html += str(content_div)
+
+    if comments_div:
+        clean_html += "\n<hr><h2>Comments</h2>\n" + str(comments_div)
+
+    # Convert to Markdown
+    return get_converter().handle(clean_html)
@@ -0,0 +1,212 @@
+# Concurrent link-following crawler (replaces the sequential RecursiveUrlLoader walk)
+import asyncio
+import random
+import time
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import httpx
+from bs4 import BeautifulSoup as Soup
+from langchain_core.documents import Document
+from config import (
+    FRONTIER_CONCURRENCY,
+    FRONTIER_DELAY,
+    FRONTIER_PER_HOST,
+    FRONTIER_RETRIES,
+)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+LOGIN_MARKER = "Sign in to your account"
+LOGIN_PATH = "/login"
+SKIPPED_EXTENSIONS = (
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".svg",
+    ".pdf",
+    ".zip",
+    ".css",
+    ".js",
+)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AuthError(Exception):
+    pass
+
+
+def normalize_url(url, base_url):
+    """
+    Resolves `url` against `base_url` and collapses variants of the same page
+    (fragment, query string, trailing slash, host case) to one key.
+    Returns None for links that leave the wiki or point at static files.
+    """
+    parts = urlsplit(urljoin(base_url, url))
+    if parts.scheme not in ("http", "https"):
+        return None
+    if parts.netloc.lower() != urlsplit(base_url).netloc.lower():
+        return None
+
+    path = parts.path.rstrip("/") or "/"
+    if path.lower().endswith(SKIPPED_EXTENSIONS):
+        return None
+
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, "", ""))
+
+
+class Frontier:
+    """URL queue + seen-set. Every normalized URL is enqueued at most once."""
+
+    def __init__(self, base_url, max_depth):
+        self.base_url = base_url
+        self.max_depth = max_depth
+        self.queue = asyncio.Queue()
+        self.seen = set()
+
+    def add(self, url, depth):
+        url = normalize_url(url, self.base_url)
+        if url is None or url in self.seen or depth > self.max_depth:
+            return False
+
+        self.seen.add(url)
+        self.queue.put_nowait((url, depth))
+        return True
+
+
+class HostLimiter:
+    """Per-host politeness: bounded parallel requests and a minimum gap between starts."""
+
+    def __init__(self, per_host=FRONTIER_PER_HOST, delay=FRONTIER_DELAY):
+        self.per_host = per_host
+        self.delay = delay
+        self.sems = {}
+        self.next_start = {}
+
+    async def __call__(self, host):
+        sem = self.sems.setdefault(host, asyncio.Semaphore(self.per_host))
+        await sem.acquire()
+
+        now = time.monotonic()
+        start = max(now, self.next_start.get(host, 0.0))
+        self.next_start[host] = start + self.delay
+        if start > now:
+            await asyncio.sleep(start - now)
+        return sem
+
+
+async def fetch_with_retry(client, url, limiter, retries=FRONTIER_RETRIES):
+    """GET with exponential backoff (+ jitter) on transport errors, 429 and 5xx."""
+    host = urlsplit(url).netloc
+
+    for attempt in range(retries + 1):
+        sem = await limiter(host)
+        try:
+            response = await client.get(url)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+            wait = 2**attempt
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            retry_after = response.headers.get("Retry-After", "")
+            wait = float(retry_after) if retry_after.isdigit() else 2**attempt
+        finally:
+            sem.release()
+
+        await asyncio.sleep(wait + random.random())
+
+
+def check_auth(response, check_body=False):
+    """
+    Raises AuthError on 401/403 or a redirect to the login page. The login
+    page text is only looked for when `check_body` (the first response): a
+    wiki page may well mention it.
+    """
+    redirected_to_login = response.history and response.url.path.startswith(LOGIN_PATH)
+    if (
+        response.status_code in (401, 403)
+        or redirected_to_login
+        or (check_body and LOGIN_MARKER in response.text)
+    ):
+        raise AuthError(f"Auth failed (Login page detected at {response.url})")
+
+
+async def crawl_site(
+    seeds,
+    cookies,
+    base_url,
+    max_depth=10,
+    concurrency=FRONTIER_CONCURRENCY,
+):
+    """
+    Walks the wiki from `seeds` (e.g. the GraphQL page list) with `concurrency`
+    workers over one pooled HTTP client. Raises AuthError on the first response
+    that looks like a login page instead of after the whole walk.
+    """
+    frontier = Frontier(base_url, max_depth)
+    for url in seeds:
+        frontier.add(url, 0)
+
+    limiter = HostLimiter()
+    documents = []
+    first_response = True
+
+    async def worker(client):
+        nonlocal first_response
+        while True:
+            url, depth = await frontier.queue.get()
+            try:
+                try:
+                    response = await fetch_with_retry(client, url, limiter)
+                except httpx.HTTPError as e:
+                    print(f"Failed {url}: {e}")
+                    continue
+
+                check_auth(response, check_body=first_response)
+                first_response = False
+
+                if (
+                    response.status_code != 200
+                    or "text/html" not in response.headers.get("content-type", "")
+                ):
+                    continue
+
+                soup = Soup(response.text, "html.parser")
+                for link in soup.find_all("a", href=True):
+                    frontier.add(link["href"], depth + 1)
+
+                documents.append(
+                    Document(
+                        page_content=soup.text,
+                        metadata={
+                            "source": url,
+                            "title": soup.title.get_text() if soup.title else "",
+                        },
+                    )
+                )
+            finally:
+                frontier.queue.task_done()
+
+    async def stop_when_done(workers):
+        await frontier.queue.join()
+        for w in workers:
+            w.cancel()
+
+    async with httpx.AsyncClient(
+        cookies=cookies,
+        headers={"User-Agent": USER_AGENT},
+        limits=httpx.Limits(
+            max_connections=concurrency, max_keepalive_connections=concurrency
+        ),
+        follow_redirects=True,
+        timeout=30,
+    ) as client:
+        try:
+            async with asyncio.TaskGroup() as tg:
+                workers = [tg.create_task(worker(client)) for _ in range(concurrency)]
+                tg.create_task(stop_when_done(workers))
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0]
+
+    print(f"Crawled {len(documents)} pages ({len(frontier.seen)} unique URLs seen).")
+    return documents
@@ -1,29 +1,178 @@
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+import asyncio
+import time
+import openai
+from langchain_openai import ChatOpenAI
 from langsmith import traceable
-from config import MODEL_NAME
+from config import EMBEDDING_MODEL, LLM_MAX_RETRIES, MODEL_NAME
+from embedding_cache import CachedEmbeddings
+from embedding_scheduler import EmbeddingScheduler
+from llm_cache import LLMCache
 from logger import log_node
+import metrics
 
 # Initialize shared instances
-openai_client = ChatOpenAI(model=MODEL_NAME, temperature=0)
-embeddings = OpenAIEmbeddings()
+# stream_usage: token counts also come back on streamed responses
+# No retries in the client, call_llm & co. handle (and count) them
+openai_client = ChatOpenAI(
+    model=MODEL_NAME, temperature=0, stream_usage=True, max_retries=0
+)
+embedding_scheduler = EmbeddingScheduler(EMBEDDING_MODEL)
+embeddings = CachedEmbeddings(embedding_scheduler, EMBEDDING_MODEL)
+# Same model, constrained to return a JSON object
+json_client = openai_client.bind(response_format={"type": "json_object"})
+llm_cache = LLMCache(MODEL_NAME)
+
+
+RETRY_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def retry_delay(node_name, error, attempt):
+    """Counts a retry of a failed chat call, returns the seconds to wait first."""
+    if isinstance(error, openai.RateLimitError):
+        metrics.inc("llm_retries_total", node=node_name, reason="rate_limit")
+        retry_after = error.response.headers.get("retry-after") or 0
+        return float(retry_after) or 2**attempt
+    metrics.inc("llm_retries_total", node=node_name, reason="connection")
+    return 2**attempt
+
+
+def usable(response, validate):
+    """validate(response) raises ValueError for a response not worth caching."""
+    if validate is None:
+        return True
+    try:
+        validate(response)
+    except ValueError:
+        return False
+    return True
+
+
+def cached_response(node_name, key, validate):
+    """The stored response for `key`, unless it fails `validate` (then dropped)."""
+    cached = llm_cache.get(node_name, key)
+    if cached is not None and not usable(cached, validate):
+        llm_cache.discard(key)
+        return None
+    return cached
+
+
+def messages_for(system_prompt: str, prompt: str):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
 
 
 @traceable(run_type="llm")
-def call_llm(node_name: str, system_prompt: str, prompt: str):
+def call_llm(
+    node_name: str, system_prompt: str, prompt: str, json_mode=False, validate=None
+):
     # log_node(
     #     node_name,
     #     {"message": f"Calling LLM with prompt: {prompt}"},
     # )
 
-    response = openai_client.invoke(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": prompt},
-        ]
-    )
+    # temperature=0: an identical prompt gets the stored response
+    key = llm_cache.key(system_prompt, prompt, json_mode)
+    cached = cached_response(node_name, key, validate)
+    if cached is not None:
+        return cached
+
+    client = json_client if json_mode else openai_client
+    start = time.perf_counter()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = client.invoke(messages_for(system_prompt, prompt))
+            break
+        except RETRY_ERRORS as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            time.sleep(retry_delay(node_name, e, attempt))
+    metrics.observe("llm_seconds", time.perf_counter() - start, node=node_name)
+    metrics.record_usage(node_name, response)
+    # A response the caller rejects is asked again next time, not replayed
+    if usable(response.content, validate):
+        llm_cache.put(key, response.content)
 
     # log_node(
     #     node_name,
     #     {"message": f"LLM response: {response.content}"},
     # )
     return response.content
+
+
+@traceable(run_type="llm")
+async def acall_llm(
+    node_name: str, system_prompt: str, prompt: str, json_mode=False, validate=None
+):
+    key = llm_cache.key(system_prompt, prompt, json_mode)
+    cached = cached_response(node_name, key, validate)
+    if cached is not None:
+        return cached
+
+    client = json_client if json_mode else openai_client
+    start = time.perf_counter()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = await client.ainvoke(messages_for(system_prompt, prompt))
+            break
+        except RETRY_ERRORS as e:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(retry_delay(node_name, e, attempt))
+    metrics.observe("llm_seconds", time.perf_counter() - start, node=node_name)
+    metrics.record_usage(node_name, response)
+    if usable(response.content, validate):
+        llm_cache.put(key, response.content)
+    return response.content
+
+
+async def astream_llm(node_name: str, system_prompt: str, prompt: str):
+    """acall_llm that yields the response text as it is generated."""
+    key = llm_cache.key(system_prompt, prompt)
+    cached = llm_cache.get(node_name, key)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    start = time.perf_counter()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            async for chunk in openai_client.astream(
+                messages_for(system_prompt, prompt)
+            ):
+                if chunk.content:
+                    if not parts:
+                        metrics.observe(
+                            "llm_first_token_seconds",
+                            time.perf_counter() - start,
+                            node=node_name,
+                        )
+                    parts.append(chunk.content)
+                    yield chunk.content
+                # Token usage arrives on the last chunk
+                metrics.record_usage(node_name, chunk)
+            break
+        except RETRY_ERRORS as e:
+            # Tokens already sent can't be taken back: only retry before the first
+            if parts or attempt == LLM_MAX_RETRIES:
+                raise
+            await asyncio.sleep(retry_delay(node_name, e, attempt))
+    metrics.observe("llm_seconds", time.perf_counter() - start, node=node_name)
+    llm_cache.put(key, "".join(parts))
+
+
+def report_llm_cache():
+    for node_name, stats in llm_cache.stats().items():
+        log_node(
+            node_name,
+            {
+                "message": f"LLM cache: {stats['hits']} hits / {stats['misses']} misses "
+                f"({stats['hit_rate']:.0%})"
+            },
+        )
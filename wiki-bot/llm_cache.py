@@ -0,0 +1,129 @@
+# Persistent exact-match cache of chat completions (temperature 0 -> same answer)
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import Counter
+import metrics
+from config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_PATH,
+    LLM_CACHE_TTL,
+)
+
+
+class LLMCache:
+    """
+    Maps model name + hash(JSON mode, system prompt, user prompt) to the response text in
+    SQLite. Entries expire after `ttl` seconds and the least recently used go
+    first past max_entries. Hits and misses are counted per graph node.
+    Set `enabled = False` to bypass it (no reads, no writes).
+    """
+
+    def __init__(
+        self,
+        model_name,
+        path=LLM_CACHE_PATH,
+        ttl=LLM_CACHE_TTL,
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        enabled=LLM_CACHE_ENABLED,
+    ):
+        self.model_name = model_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = Counter()
+        self.misses = Counter()
+
+        # Nodes may call the LLM from worker threads, one connection behind a lock
+        self.lock = threading.Lock()
+        self.path = path
+        self._db = None
+
+    @property
+    def db(self):
+        """Opened lazily, so importing llm.py leaves no cache file behind."""
+        if self._db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+            )
+            self._db = db
+        return self._db
+
+    def key(self, system_prompt, prompt, json_mode=False):
+        text = f"{self.model_name}\0{json_mode:d}\0{system_prompt}\0{prompt}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get(self, node_name, key):
+        if not self.enabled:
+            return None
+
+        with self.lock:
+            now = time.time()
+            row = self.db.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is None:
+                self.misses[node_name] += 1
+                metrics.inc("llm_cache_misses_total", node=node_name)
+                return None
+
+            self.db.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self.db.commit()
+            self.hits[node_name] += 1
+            metrics.inc("llm_cache_hits_total", node=node_name)
+            return row[0]
+
+    def put(self, key, response):
+        if not self.enabled:
+            return
+
+        with self.lock:
+            now = time.time()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self.db.commit()
+            self.evict(now)
+
+    def discard(self, key):
+        """Drops one entry, e.g. a response the caller could not use."""
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.db.commit()
+
+    def evict(self, now):
+        self.db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        count = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+        self.db.commit()
+
+    def stats(self):
+        """{node: {"hits", "misses", "hit_rate"}} for every node seen so far."""
+        return {
+            node: {
+                "hits": self.hits[node],
+                "misses": self.misses[node],
+                "hit_rate": self.hits[node] / (self.hits[node] + self.misses[node]),
+            }
+            for node in sorted(set(self.hits) | set(self.misses))
+        }
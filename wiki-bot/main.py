@@ -1,15 +1,76 @@
 import asyncio
 import json
 import sys
-from config import WIKI_URL, COOKIES_FILE
-from crawler import get_all_wiki_paths, crawl_wiki_pages_async
-from vector_store import populate_vector_store
-from graph import build_workflow
+from config import (
+    WIKI_URL,
+    COOKIES_FILE,
+    CRAWL_BACKEND,
+    LLM_CACHE_ENABLED,
+    METRICS_ENABLED,
+    REPHRASE_QUERY,
+    VECTOR_BACKEND,
+)
+from crawl_cache import CrawlCache
+from crawler import get_all_wiki_pages, iter_pages
+from dedup import Deduplicator
+from manifest import load_manifest, save_manifest, diff_pages, record_crawl
+from pipeline import index_stream
+from vector_store import (
+    build_bm25_index,
+    build_numpy_index,
+    delete_sources,
+    get_vector_store,
+    prune_sources,
+)
+from graph import build_fast_workflow, build_workflow
+from runner import answer_cache, stream_query
+from llm import embedding_scheduler, llm_cache, report_llm_cache
+from logger import update_line
+import metrics
 from fun_args import argumentize
 
 
-async def main(reset: bool = False):
-    if reset:
+def finish_refresh():
+    build_bm25_index()
+    if VECTOR_BACKEND == "numpy":
+        build_numpy_index()
+    embedding_scheduler.report()
+
+
+async def main(
+    reset: bool = False,
+    incremental: bool = False,
+    backend: str = CRAWL_BACKEND,
+    from_cache: bool = False,
+    rephrase: bool = REPHRASE_QUERY,
+    fast: bool = False,
+    cache_answers: bool = True,
+    cache_llm: bool = LLM_CACHE_ENABLED,
+    record_metrics: bool = METRICS_ENABLED,
+):
+    llm_cache.enabled = cache_llm
+    metrics.enable(record_metrics)
+    cache = CrawlCache()
+
+    if from_cache:
+        # Rebuild the index offline from previously crawled pages, minus the
+        # ones the manifest has tombstoned as deleted from the wiki
+        manifest = load_manifest()
+        deleted = [u for u, e in manifest.items() if e.get("deleted_at")]
+        cache.delete(deleted)
+        print(f"Rebuilding vector store from {len(cache)} cached pages...")
+        vector_store = get_vector_store("chroma")
+        dedup = Deduplicator()
+        await index_stream(cache.aiter_documents(), vector_store, dedup=dedup)
+        dedup.save()
+        # The cache is LRU-evicted, so it can't tell which pages still exist:
+        # prune against the manifest (the last crawl's page list) instead
+        if manifest:
+            live = {u for u, e in manifest.items() if not e.get("deleted_at")}
+            prune_sources(vector_store, live | set(cache.urls()))
+        finish_refresh()
+
+    elif reset or incremental:
 
         # 1. Load cookies
         try:
@@ -19,30 +80,76 @@ async def main(reset: bool = False):
             print("Please run auth_cli.py first to generate cookies.")
             return
 
-        # 2. Scrape (Optional: Add a flag to skip this if DB exists)
-        urls = get_all_wiki_paths(WIKI_URL, cookie_list)
-        documents = await crawl_wiki_pages_async(urls, cookie_list)
+        pages = get_all_wiki_pages(WIKI_URL, cookie_list)
+        if not pages:
+            print("Could not list wiki pages, keeping the existing vector store.")
+            return
+
+        if incremental and not reset:
+            # 2. Only what changed since the last crawl needs scraping
+            manifest = load_manifest()
+            changed, deleted = diff_pages(pages, manifest)
+            print(f"{len(changed)} new/modified and {len(deleted)} deleted pages.")
 
-        # 3. Index
-        populate_vector_store(documents, reset=reset)
+            delete_sources(get_vector_store("chroma"), deleted)
+            cache.delete(deleted)
+            save_manifest(record_crawl(manifest, [], [], deleted))
+
+            # Dedup against every page indexed so far, not just this run's
+            dedup = Deduplicator.load()
+            for url in deleted:
+                dedup.forget(url)
+        else:
+            # 2. Scrape everything. The store is refreshed in place (upserts),
+            # so it keeps answering queries while the crawl runs
+            manifest, changed = {}, pages
+            dedup = Deduplicator()
+
+        # 3. Index pages as they are scraped, checkpointing the manifest per batch
+        def checkpoint(docs):
+            save_manifest(record_crawl(manifest, changed, docs))
+            dedup.save()
+
+        await index_stream(
+            iter_pages(changed, cookie_list, backend, cache),
+            get_vector_store("chroma"),
+            on_indexed=checkpoint,
+            dedup=dedup,
+        )
+
+        if reset:
+            live = {p["url"] for p in pages}
+            prune_sources(get_vector_store("chroma"), live)
+            cache.delete(set(cache.urls()) - live)
+
+        finish_refresh()
     else:
-        print("Using existing vector store (pass --reset to refresh).")
+        print(
+            "Using existing vector store "
+            "(pass --reset, --incremental or --from-cache to refresh)."
+        )
 
     # 4. Run Graph
-    app = build_workflow()
-
-    initial_state = {
-        "query": "What's the purpose of Sd logger?",
-        "intent_node_output_ok": False,
-        "intent_node_output": None,
-        "search_node_output": None,
-        "context_chunks": [],
-        "summarize_node_output": None,
-    }
-
-    print(f"Question: {initial_state['query']}")
-    final_state = await app.ainvoke(initial_state)
-    print(f"\rAnswer: {final_state['summarize_node_output']}\n")
+    app = build_fast_workflow() if fast else build_workflow(rephrase)
+
+    query = "What's the purpose of Sd logger?"
+    print(f"Question: {query}")
+    answering = False
+    async for event in stream_query(
+        app, query, answer_cache if cache_answers else None
+    ):
+        if event["type"] == "progress":
+            update_line(event["message"])
+        elif event["type"] == "token":
+            if not answering:
+                update_line("Answer: ")
+                answering = True
+            sys.stdout.write(event["text"])
+            sys.stdout.flush()
+        elif event["type"] == "answer" and not answering:
+            update_line(f"Answer: {event['text']}")
+    print("\n")
+    report_llm_cache()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import json
+import os
+from datetime import datetime, timezone
+from config import MANIFEST_FILE
+
+
+def load_manifest(path=MANIFEST_FILE):
+    """Returns {url: entry} for every page indexed by a previous crawl."""
+    if not os.path.exists(path):
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    # Write to a temp file first so a crash never leaves a half-written manifest
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def diff_pages(pages, manifest):
+    """
+    Compares the live page list with the manifest.
+    Returns (pages that are new or modified, urls of pages deleted from the wiki).
+    """
+    live_urls = {p["url"] for p in pages}
+
+    changed = []
+    for page in pages:
+        entry = manifest.get(page["url"])
+        if (
+            entry is None
+            or entry.get("deleted_at")
+            or entry.get("updatedAt") != page.get("updatedAt")
+        ):
+            changed.append(page)
+
+    deleted = [
+        url
+        for url, entry in manifest.items()
+        if url not in live_urls and not entry.get("deleted_at")
+    ]
+
+    return changed, deleted
+
+
+def record_crawl(manifest, pages, documents, deleted_urls=()):
+    """
+    Marks scraped pages as indexed and tombstones deleted ones.
+    Pages that failed to scrape are left untouched so the next run retries them.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    scraped = {d.metadata["source"] for d in documents}
+
+    for page in pages:
+        if page["url"] not in scraped:
+            continue
+        manifest[page["url"]] = {
+            "id": page.get("id"),
+            "title": page.get("title"),
+            "updatedAt": page.get("updatedAt"),
+            "indexed_at": now,
+        }
+
+    for url in deleted_urls:
+        if url in manifest:
+            manifest[url]["deleted_at"] = now
+
+    return manifest
@@ -0,0 +1,163 @@
+# In-process metrics: labelled counters and histograms, Prometheus text / JSON export
+import atexit
+import bisect
+import json
+import threading
+from config import METRICS_ENABLED, METRICS_SUMMARY_PATH
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+enabled = False
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> Histogram
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimated from the buckets, interpolating inside the matching one
+        (bounded by the smallest / largest value actually seen).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen, lower = 0, self.min
+        for upper, n in zip([*self.buckets, self.max], self.counts):
+            upper = min(upper, self.max)
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = max(lower, upper)
+        return self.max
+
+
+def enable(on=True):
+    """Turns recording on (and the JSON summary at exit); off it costs one check."""
+    global enabled
+    if on and not enabled:
+        atexit.register(write_summary)
+    enabled = on
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if not enabled:
+        return
+    key = (name, label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=SECONDS_BUCKETS, **labels):
+    if not enabled:
+        return
+    key = (name, label_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+def record_usage(node_name, message):
+    """Prompt / completion token counters from a chat model response."""
+    usage = getattr(message, "usage_metadata", None)
+    if not enabled or not usage:
+        return
+    inc("llm_prompt_tokens_total", usage.get("input_tokens", 0), node=node_name)
+    inc("llm_completion_tokens_total", usage.get("output_tokens", 0), node=node_name)
+    observe(
+        "llm_tokens",
+        usage.get("total_tokens", 0),
+        buckets=TOKEN_BUCKETS,
+        node=node_name,
+    )
+
+
+def format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name in sorted({name for name, _ in _counters}):
+            lines.append(f"# TYPE wikibot_{name} counter")
+            for (n, labels), value in sorted(_counters.items()):
+                if n == name:
+                    lines.append(f"wikibot_{name}{format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in _histograms}):
+            lines.append(f"# TYPE wikibot_{name} histogram")
+            for (n, labels), h in sorted(_histograms.items(), key=lambda i: i[0]):
+                if n != name:
+                    continue
+                cumulative = 0
+                for upper, count in zip([*h.buckets, "+Inf"], h.counts):
+                    cumulative += count
+                    le = format_labels(labels, [("le", upper)])
+                    lines.append(f"wikibot_{name}_bucket{le} {cumulative}")
+                lines.append(f"wikibot_{name}_sum{format_labels(labels)} {h.sum}")
+                lines.append(f"wikibot_{name}_count{format_labels(labels)} {h.count}")
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """{"counters": {...}, "histograms": {...}} keyed by name{labels}."""
+    with _lock:
+        return {
+            "counters": {
+                f"{name}{format_labels(labels)}": value
+                for (name, labels), value in sorted(_counters.items())
+            },
+            "histograms": {
+                f"{name}{format_labels(labels)}": {
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "mean": round(h.sum / h.count, 6) if h.count else 0.0,
+                    "p50": round(h.quantile(0.5), 6),
+                    "p95": round(h.quantile(0.95), 6),
+                }
+                for (name, labels), h in sorted(_histograms.items(), key=lambda i: i[0])
+            },
+        }
+
+
+def write_summary(path=METRICS_SUMMARY_PATH):
+    if not _counters and not _histograms:
+        return
+    with open(path, "w") as f:
+        json.dump(summary(), f, indent=2)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+enable(METRICS_ENABLED)
@@ -0,0 +1,233 @@
+# Read-only vector index: memory-mapped NumPy matrix (float32 or int8) + JSON sidecar
+import json
+import os
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from config import NUMPY_IVF_MIN_ROWS, NUMPY_IVF_NPROBE
+
+META_FILE = "meta.json"
+SCORE_BLOCK_ROWS = 4096  # rows scored per matmul
+GET_PAGE_ROWS = 5000  # rows per Chroma get(), one call for all hits SQLite's limits
+
+
+def normalize(x):
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def quantize(x):
+    """Symmetric per-row int8 quantization: x ~= q * scale."""
+    scales = np.abs(x).max(axis=1, initial=0.0) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.round(x / scales[:, None]).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+def kmeans(x, k, iterations=10, seed=0, block=8192):
+    """Spherical k-means (vectors are unit length), assignments computed in blocks."""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.concatenate(
+            [
+                np.argmax(x[i : i + block] @ centroids.T, axis=1)
+                for i in range(0, len(x), block)
+            ]
+        )
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, x)
+        counts = np.bincount(assignments, minlength=k)
+        # Empty clusters keep their previous centroid
+        filled = counts > 0
+        centroids[filled] = normalize(sums[filled])
+
+    return centroids, assignments
+
+
+def get_all(chroma_store, include, page=GET_PAGE_ROWS):
+    """chroma_store.get(include=...) for the whole collection, fetched in pages."""
+    data = {"ids": [], **{field: [] for field in include}}
+    offset = 0
+    while True:
+        batch = chroma_store.get(include=include, limit=page, offset=offset)
+        for field in data:
+            data[field].extend(batch[field])
+        if len(batch["ids"]) < page:
+            return data
+        offset += page
+
+
+def write_array(path, name, array):
+    # Write next to the target and swap in, readers keep their old mmap
+    tmp_path = os.path.join(path, f"{name}.tmp.npy")
+    np.save(tmp_path, array)
+    os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Cosine-similarity search over a memory-mapped embedding matrix.
+
+    Rows are unit-normalized, optionally int8-quantized with a float32 scale per
+    row. Large corpora get an IVF layout: rows are sorted by k-means cluster and
+    a query only scans the NUMPY_IVF_NPROBE clusters closest to it.
+    Built from the Chroma collection with `build()`; writes go to Chroma.
+    """
+
+    def __init__(self, path, embedding, nprobe=NUMPY_IVF_NPROBE):
+        self.path = path
+        self.embedding = embedding
+        self.nprobe = nprobe
+
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        self.ids = meta["ids"]
+        self.texts = meta["documents"]
+        self.metadatas = meta["metadatas"]
+        self.rows = {id_: row for row, id_ in enumerate(self.ids)}
+
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = (
+            np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+            if meta["quantized"]
+            else None
+        )
+        self.centroids = self.offsets = None
+        if meta["ivf"]:
+            self.centroids = np.load(os.path.join(path, "centroids.npy"))
+            self.offsets = np.load(os.path.join(path, "offsets.npy"))
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    @classmethod
+    def build(
+        cls,
+        chroma_store,
+        path,
+        quantized=True,
+        ivf_min_rows=NUMPY_IVF_MIN_ROWS,
+    ):
+        """Exports every chunk of a Chroma store into a NumPy index at `path`."""
+        data = get_all(chroma_store, ["embeddings", "documents", "metadatas"])
+        ids, documents, metadatas = data["ids"], data["documents"], data["metadatas"]
+        # An empty collection (e.g. a failed first crawl) gives an empty index
+        vectors = normalize(
+            np.asarray(data["embeddings"], dtype=np.float32).reshape(len(ids), -1)
+            if ids
+            else np.zeros((0, 0), dtype=np.float32)
+        )
+        os.makedirs(path, exist_ok=True)
+
+        ivf = bool(ids) and len(ids) >= ivf_min_rows
+        if ivf:
+            centroids, assignments = kmeans(vectors, int(np.sqrt(len(ids))))
+            order = np.argsort(assignments, kind="stable")
+            vectors = vectors[order]
+            ids = [ids[i] for i in order]
+            documents = [documents[i] for i in order]
+            metadatas = [metadatas[i] for i in order]
+            counts = np.bincount(assignments, minlength=len(centroids))
+            write_array(path, "centroids", centroids)
+            write_array(path, "offsets", np.concatenate([[0], np.cumsum(counts)]))
+
+        if quantized:
+            vectors, scales = quantize(vectors)
+            write_array(path, "scales", scales)
+        write_array(path, "vectors", vectors)
+
+        # The sidecar goes last: its mtime is the index version readers check
+        tmp_path = os.path.join(path, f"{META_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "ids": ids,
+                    "documents": documents,
+                    "metadatas": metadatas,
+                    "quantized": quantized,
+                    "ivf": ivf,
+                },
+                f,
+            )
+        os.replace(tmp_path, os.path.join(path, META_FILE))
+        return len(ids)
+
+    def candidate_rows(self, query):
+        """Row ranges to scan: everything, or the nprobe nearest IVF clusters."""
+        if self.centroids is None:
+            return [(0, len(self.ids))]
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return [(self.offsets[c], self.offsets[c + 1]) for c in nearest]
+
+    def search(self, embedding, k):
+        """Returns [(row, cosine similarity)] for the k best rows, best first."""
+        if not self.ids:
+            return []
+        query = normalize(np.asarray(embedding, dtype=np.float32))
+
+        rows, scores = [], []
+        for first, last in self.candidate_rows(query):
+            # int8 rows are cast to float32 a block at a time, so a query never
+            # materializes a float32 copy of the whole matrix
+            for start in range(first, last, SCORE_BLOCK_ROWS):
+                end = min(start + SCORE_BLOCK_ROWS, last)
+                block_scores = self.vectors[start:end] @ query
+                if self.scales is not None:
+                    block_scores *= self.scales[start:end]
+                rows.append(np.arange(start, end))
+                scores.append(block_scores)
+
+        if not rows:
+            return []
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def document(self, row):
+        return Document(
+            id=self.ids[row], page_content=self.texts[row], metadata=self.metadatas[row]
+        )
+
+    def get_vectors(self, ids):
+        """Stored (dequantized) unit vectors of the chunks `ids`, in order."""
+        rows = np.asarray([self.rows[i] for i in ids], dtype=np.int64)
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        return vectors if self.scales is None else vectors * self.scales[rows, None]
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4):
+        return [(self.document(row), score) for row, score in self.search(embedding, k)]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [
+            doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)
+        ]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        """Scores are cosine similarities (higher is better)."""
+        embedding = self.embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError(
+            "NumpyVectorStore is read-only, write to Chroma and rebuild it"
+        )
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError(
+            "NumpyVectorStore is read-only, build it from Chroma with build()"
+        )
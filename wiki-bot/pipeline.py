@@ -0,0 +1,88 @@
+# Streaming crawl -> chunk -> embed -> index pipeline
+import asyncio
+from chunker import MarkdownChunker
+from config import INDEX_BATCH_SIZE, INDEX_QUEUE_SIZE
+from logger import log_node
+from vector_store import upsert_sources
+
+
+async def index_stream(
+    documents,
+    vector_store,
+    batch_size=INDEX_BATCH_SIZE,
+    queue_size=INDEX_QUEUE_SIZE,
+    on_indexed=None,
+    dedup=None,
+):
+    """
+    Chunks and indexes an async stream of Documents as they arrive.
+
+    Chunks are grouped into batches of whole documents (~batch_size chunks) and
+    handed to the indexing stage through a bounded queue. Every batch is written
+    to Chroma before the next one is taken, so a crash only loses the batches
+    still in flight. `on_indexed(docs)` is called after each batch is persisted.
+    An optional `dedup` (dedup.Deduplicator) drops near-duplicate pages/chunks
+    and boilerplate before anything is embedded. Dropped pages are left out of
+    `on_indexed`, so they aren't recorded as indexed and are looked at again
+    on the next crawl (e.g. after the page they duplicate changed).
+    """
+    chunker = MarkdownChunker()
+    batches = asyncio.Queue(maxsize=queue_size)
+    stats = {"documents": 0, "chunks": 0, "embedded": 0, "removed": 0}
+
+    async def chunk_stage():
+        docs, kept, chunks = [], [], []
+        async for doc in documents:
+            docs.append(doc)
+            if dedup is None:
+                kept.append(doc)
+                chunks += chunker.split_documents([doc])
+            else:
+                page = dedup.filter_page(doc)
+                if page is not None:
+                    kept.append(page)
+                    page_chunks = chunker.split_documents([page])
+                    chunks += dedup.filter_chunks(page_chunks)
+
+            if len(chunks) >= batch_size:
+                await batches.put((docs, kept, chunks))
+                docs, kept, chunks = [], [], []
+        if docs:
+            await batches.put((docs, kept, chunks))
+        await batches.put(None)
+
+    async def index_stage():
+        while (batch := await batches.get()) is not None:
+            # Every doc's source is upserted: a dropped duplicate loses its chunks
+            docs, kept, chunks = batch
+            added, removed = await asyncio.to_thread(
+                write_batch, vector_store, docs, chunks
+            )
+            stats["documents"] += len(docs)
+            stats["chunks"] += len(chunks)
+            stats["embedded"] += added
+            stats["removed"] += removed
+            if on_indexed:
+                on_indexed(kept)
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(chunk_stage())
+        tg.create_task(index_stage())
+
+    log_node(
+        "PIPELINE",
+        {
+            "message": f"Indexed {stats['chunks']} chunks from {stats['documents']} documents "
+            f"({stats['embedded']} embedded, {stats['removed']} removed)"
+        },
+    )
+    if dedup is not None:
+        log_node("DEDUP", {"message": dedup.report()})
+        stats["dedup"] = dict(dedup.stats)
+    return stats
+
+
+def write_batch(vector_store, docs, chunks):
+    # Embedding happens inside add_documents, so this runs in a worker thread.
+    # Each document replaces its source's chunks, unchanged ones aren't re-embedded
+    return upsert_sources(vector_store, chunks, {d.metadata["source"] for d in docs})
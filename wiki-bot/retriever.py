@@ -0,0 +1,210 @@
+# Hybrid retrieval: dense vector hits + BM25 keyword hits, fused by rank,
+# diversified with MMR and packed into the summarizer's token budget
+import asyncio
+import numpy as np
+from config import (
+    CONTEXT_MAX_TOKENS,
+    HYBRID_FETCH_K,
+    MMR_LAMBDA,
+    RETRIEVAL_K,
+    RETRIEVAL_MODE,
+    RRF_K,
+)
+from llm import embeddings
+from numpy_store import normalize
+from tokens import count_tokens
+from vector_store import get_bm25_index, get_embeddings, get_vector_store
+
+# Overlap looked for when stitching neighbours (old splitter: 100 chars);
+# shorter matches are coincidence, not overlap
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 200
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Merges ranked Document lists: each list adds 1 / (k + rank) to a document's
+    score, so documents ranked well by several retrievers come first.
+    Returns [(document, score)], best first.
+    """
+    scores, documents = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+            documents.setdefault(key, doc)
+
+    return [
+        (documents[key], scores[key])
+        for key in sorted(scores, key=scores.get, reverse=True)
+    ]
+
+
+def mmr(relevance, vectors, k, lambda_mult=MMR_LAMBDA):
+    """
+    Maximal marginal relevance: picks k rows, each maximizing
+    lambda * relevance - (1 - lambda) * max cosine similarity to the rows
+    already picked. Returns the picked row indices in order.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread else relevance * 0
+
+    vectors = normalize(vectors)
+    similarity = vectors @ vectors.T
+
+    picked = [int(np.argmax(relevance))]
+    redundancy = similarity[picked[0]].copy()
+    available = np.ones(len(vectors), dtype=bool)
+    available[picked[0]] = False
+
+    while len(picked) < min(k, len(vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def search(query, query_vector, k, mode, fetch_k, lambda_mult):
+    """Local part of retrieve(): index lookups and re-ranking, no API calls."""
+    vector_store = get_vector_store()
+    dense = vector_store.similarity_search_by_vector(query_vector, k=fetch_k)
+
+    bm25 = get_bm25_index() if mode == "hybrid" else None
+    stored = None
+    if bm25 is None:
+        candidates, relevance = dense, None
+    else:
+        fused = reciprocal_rank_fusion([dense, bm25.search_documents(query, fetch_k)])
+        # BM25 is only rebuilt once a refresh is done, until then it can name
+        # chunks that were edited or deleted: keep what the dense store has
+        stored = get_embeddings(vector_store, [doc.id for doc, _ in fused[:fetch_k]])
+        fused = [(doc, score) for doc, score in fused[:fetch_k] if doc.id in stored]
+        candidates = [doc for doc, _ in fused]
+        relevance = [score for _, score in fused]
+
+    if len(candidates) <= 1 or lambda_mult >= 1:
+        return candidates[:k]
+
+    if stored is None:
+        stored = get_embeddings(vector_store, [doc.id for doc in candidates])
+    vectors = np.stack([stored[doc.id] for doc in candidates])
+    if relevance is None:
+        relevance = normalize(vectors) @ normalize(np.asarray(query_vector))
+    return [candidates[i] for i in mmr(relevance, vectors, k, lambda_mult)]
+
+
+def retrieve(
+    query,
+    k=RETRIEVAL_K,
+    mode=RETRIEVAL_MODE,
+    fetch_k=HYBRID_FETCH_K,
+    lambda_mult=MMR_LAMBDA,
+):
+    """
+    Top-k chunks for `query`: fetch_k candidates from dense search ("dense") or
+    from dense + BM25 fused with RRF ("hybrid"), re-ranked with MMR so
+    near-identical chunks don't crowd out the rest.
+    """
+    query_vector = embeddings.embed_query(query)
+    return search(query, query_vector, k, mode, fetch_k, lambda_mult)
+
+
+async def aretrieve(
+    query,
+    k=RETRIEVAL_K,
+    mode=RETRIEVAL_MODE,
+    fetch_k=HYBRID_FETCH_K,
+    lambda_mult=MMR_LAMBDA,
+):
+    """
+    Async retrieve(): the query embedding is awaited, the local index search
+    runs in a worker thread so Chroma's blocking calls never stall the loop.
+    """
+    query_vector = await embeddings.aembed_query(query)
+    return await asyncio.to_thread(
+        search, query, query_vector, k, mode, fetch_k, lambda_mult
+    )
+
+
+def keyword_search(query, k=RETRIEVAL_K):
+    """
+    BM25 hits only, no embedding call. Empty until the BM25 index is built.
+    Like search(), hits the dense store no longer has are dropped.
+    """
+    bm25 = get_bm25_index()
+    if bm25 is None:
+        return []
+    hits = bm25.search_documents(query, k)
+    stored = get_embeddings(get_vector_store(), [doc.id for doc in hits])
+    return [doc for doc in hits if doc.id in stored]
+
+
+def stitch(first, second):
+    """Joins two neighbouring chunks, dropping text they share at the seam."""
+    if second in first:
+        return first
+    longest = min(len(first), len(second), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return f"{first}\n\n{second}"
+
+
+def merge_adjacent(docs):
+    """
+    Merges chunks of the same page that are neighbours (consecutive
+    chunk_index) into one passage, in the rank order of their best chunk.
+    Returns [(source, text)].
+    """
+    by_source = {}
+    for doc in docs:
+        by_source.setdefault(doc.metadata.get("source"), []).append(doc)
+
+    passages = []
+    for source, group in by_source.items():
+        if any("chunk_index" not in doc.metadata for doc in group):
+            passages += [(source, doc.page_content) for doc in group]
+            continue
+
+        group.sort(key=lambda doc: doc.metadata["chunk_index"])
+        text, last = group[0].page_content, group[0].metadata["chunk_index"]
+        for doc in group[1:]:
+            index = doc.metadata["chunk_index"]
+            if index == last + 1:
+                # A continuation chunk repeats its heading path as first line
+                content = doc.page_content
+                headings = doc.metadata.get("headings")
+                if headings and content.startswith(headings + "\n\n"):
+                    content = content[len(headings) + 2 :]
+                text = stitch(text, content)
+            else:
+                passages.append((source, text))
+                text = doc.page_content
+            last = index
+        passages.append((source, text))
+
+    rank = {}
+    for i, doc in enumerate(docs):
+        rank.setdefault(doc.metadata.get("source"), i)
+    return sorted(passages, key=lambda passage: rank[passage[0]])
+
+
+def pack_context(docs, max_tokens=CONTEXT_MAX_TOKENS):
+    """
+    Takes chunks best first while they fit in max_tokens (a chunk that doesn't
+    fit is skipped so a smaller one further down can still go in), then merges
+    neighbours. Merging only removes text, so the result stays in budget.
+    Returns [(source, text)] passages.
+    """
+    packed, used = [], 0
+    for doc in docs:
+        tokens = count_tokens(doc.page_content)
+        if used + tokens > max_tokens:
+            continue
+        packed.append(doc)
+        used += tokens
+    return merge_adjacent(packed)
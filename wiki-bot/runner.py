@@ -0,0 +1,80 @@
+# Answers a question: semantic answer cache first, the graph on a miss
+import time
+from answer_cache import AnswerCache
+from config import VECTOR_BACKEND
+from llm import embeddings
+from logger import log_node
+from vector_store import index_version
+
+answer_cache = AnswerCache(embeddings)
+
+
+def initial_state(query):
+    return {
+        "query": query,
+        "intent_node_output_ok": False,
+        "intent_node_output": None,
+        "search_node_output": None,
+        "context_chunks": [],
+        "context_sources": [],
+        "summarize_node_output": None,
+        "node_timings": {},
+    }
+
+
+async def stream_query(app, query, cache=answer_cache):
+    """
+    Answers `query` as a stream of event dicts:
+    {"type": "progress", "node", "message"} when a node starts working,
+    {"type": "node", "node"} when it is done, {"type": "token", "text"} for
+    each piece of the answer and finally {"type": "answer", "text", "cached",
+    "sources"} (sources is None for cached answers).
+    A query close enough to one already answered from the current index is
+    served from `cache` without any LLM call. Pass cache=None to always run
+    the graph.
+    """
+    if cache is not None:
+        start = time.perf_counter()
+        version = index_version(VECTOR_BACKEND)
+        # Embedded once: the graph's retrieval reuses it from the embedding cache
+        vector = await embeddings.aembed_query(query)
+
+        answer = cache.get(query, version, vector)
+        if answer is not None:
+            log_node(
+                "ANSWER_CACHE",
+                {"message": f"Hit in {(time.perf_counter() - start) * 1000:.1f} ms"},
+            )
+            yield {"type": "token", "text": answer}
+            yield {"type": "answer", "text": answer, "cached": True, "sources": None}
+            return
+
+    answer, sources = None, []
+    async for mode, chunk in app.astream(
+        initial_state(query), stream_mode=["custom", "updates"]
+    ):
+        if mode == "custom":
+            yield chunk
+            continue
+        for node, update in chunk.items():
+            yield {"type": "node", "node": node}
+            if not update:
+                continue
+            if update.get("summarize_node_output") is not None:
+                answer = update["summarize_node_output"]
+            if update.get("context_sources"):
+                sources = update["context_sources"]
+
+    # No answer when the intent node failed, don't pin that in the cache
+    if answer and cache is not None:
+        cache.put(query, answer, version, vector)
+    yield {"type": "answer", "text": answer, "cached": False, "sources": sources}
+
+
+async def answer_query(app, query, cache=answer_cache):
+    """Returns the answer to `query` (see stream_query)."""
+    answer = None
+    async for event in stream_query(app, query, cache):
+        if event["type"] == "answer":
+            answer = event["text"]
+    return answer
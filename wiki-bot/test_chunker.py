@@ -0,0 +1,45 @@
+from chunker import MarkdownChunker, parse_blocks
+from extract import html_to_markdown
+
+
+def wiki_html(body):
+    return f'<html><body><div class="contents">{body}</div></body></html>'
+
+
+def test_html2text_table_and_pre_are_blocks():
+    rows = "".join(f"<tr><td>P{i}</td><td>Use {i}. Done.</td></tr>" for i in range(3))
+    markdown = html_to_markdown(
+        wiki_html(
+            "<h2>Pins</h2><p>Intro.</p>"
+            f"<table><tr><th>Pin</th><th>Use</th></tr>{rows}</table>"
+            "<p>After.</p><pre><code>x = 1\n\ny = 2</code></pre><p>End.</p>"
+        )
+    )
+
+    blocks = parse_blocks(markdown)
+    kinds = [kind for kind, _ in blocks]
+    assert kinds == ["heading", "text", "table", "text", "code", "text"]
+
+    table = dict(blocks)["table"].split("\n")
+    assert len(table) == 5 and table[2].startswith("P0|")
+    assert dict(blocks)["code"].split("\n") == ["    x = 1", "    ", "    y = 2"]
+
+
+def test_long_html2text_table_splits_by_rows():
+    rows = "".join(
+        f"<tr><td>P{i}</td><td>Pin {i} drives the relay. It is active low.</td></tr>"
+        for i in range(120)
+    )
+    markdown = html_to_markdown(
+        wiki_html(
+            f"<h2>Pins</h2><table><tr><th>Pin</th><th>Use</th></tr>{rows}</table>"
+        )
+    )
+
+    chunks = MarkdownChunker(max_tokens=200).split_text(markdown)
+    assert len(chunks) > 1
+    for _, text in chunks:
+        lines = [l for l in text.split("\n") if "|" in l]
+        # Every piece repeats the header and keeps whole rows, one per line
+        assert lines[0].startswith("Pin|") and lines[1].startswith("---|")
+        assert all(l.split("|")[0].strip().startswith("P") for l in lines[2:])
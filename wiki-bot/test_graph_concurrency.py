@@ -0,0 +1,56 @@
+import asyncio
+import os
+import time
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+LLM_LATENCY = 0.2
+QUERIES = 20
+
+
+class SlowChatModel:
+    """Stands in for the OpenAI client: every call takes LLM_LATENCY seconds."""
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(LLM_LATENCY)
+        if "JSON" in messages[0]["content"]:
+            return AIMessage(content='{"intent": "test", "need_more_info": false}')
+        return AIMessage(content="answer")
+
+    async def astream(self, messages):
+        await asyncio.sleep(LLM_LATENCY)
+        for token in ("ans", "wer"):
+            yield AIMessageChunk(content=token)
+
+
+async def slow_retrieve(query, **kwargs):
+    await asyncio.sleep(LLM_LATENCY)
+    return [Document(id="1", page_content=f"chunk for {query}", metadata={})]
+
+
+def test_parallel_queries_take_about_as_long_as_one(tmp_path, monkeypatch):
+    # Caches open their SQLite files on first use: keep them out of the repo
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "test"))
+    import graph
+    import llm
+    from runner import initial_state
+
+    monkeypatch.setattr(llm, "openai_client", SlowChatModel())
+    monkeypatch.setattr(llm.llm_cache, "enabled", False)
+    monkeypatch.setattr(graph, "aretrieve", slow_retrieve)
+    app = graph.build_workflow()
+
+    async def run(n):
+        start = time.perf_counter()
+        states = await asyncio.gather(
+            *[app.ainvoke(initial_state(f"question {i}")) for i in range(n)]
+        )
+        return time.perf_counter() - start, states
+
+    single, _ = asyncio.run(run(1))
+    parallel, states = asyncio.run(run(QUERIES))
+
+    assert all(s["summarize_node_output"] == "answer" for s in states)
+    # Sequential would be QUERIES x single
+    assert parallel < 2 * single
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import os
+import httpx
+import openai
+from langchain_core.messages import AIMessage
+import metrics
+from llm_cache import LLMCache
+
+
+class ScriptedChatModel:
+    """Stands in for the OpenAI client: returns (or raises) these, in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    async def ainvoke(self, messages):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return AIMessage(content=response)
+
+
+def test_responses_failing_validation_are_not_replayed(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "test"))
+    import llm
+
+    monkeypatch.setattr(llm, "llm_cache", LLMCache("test", path=tmp_path / "llm.db"))
+    monkeypatch.setattr(llm, "openai_client", ScriptedChatModel("oops", '{"a": 1}'))
+
+    def ask():
+        return asyncio.run(llm.acall_llm("INTENT", "sys", "q", validate=json.loads))
+
+    assert ask() == "oops"
+    assert ask() == '{"a": 1}'
+    assert ask() == '{"a": 1}'  # now from the cache, the model has nothing left
+
+
+def test_json_mode_is_part_of_the_key():
+    cache = LLMCache("test")
+    assert cache.key("sys", "q") != cache.key("sys", "q", json_mode=True)
+
+
+def test_failed_chat_calls_are_retried_and_counted(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "test"))
+    import llm
+
+    async def no_wait(seconds):
+        pass
+
+    dropped = openai.APIConnectionError(request=httpx.Request("POST", "https://api"))
+    monkeypatch.setattr(llm, "llm_cache", LLMCache("test", path=tmp_path / "llm.db"))
+    monkeypatch.setattr(llm, "openai_client", ScriptedChatModel(dropped, "answer"))
+    monkeypatch.setattr(llm.asyncio, "sleep", no_wait)
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "_counters", {})
+
+    assert asyncio.run(llm.acall_llm("SEARCH_QUERY", "sys", "q")) == "answer"
+    key = ("llm_retries_total", (("node", "SEARCH_QUERY"), ("reason", "connection")))
+    assert metrics._counters[key] == 1
@@ -0,0 +1,24 @@
+from langchain_core.documents import Document
+from crawl_cache import make_document
+
+
+def page(name, text):
+    return make_document(f"https://wiki/{name}", name.title(), text)
+
+
+def test_bm25_hits_deleted_from_the_store_are_skipped(vector_store):
+    from retriever import keyword_search, retrieve
+
+    pages = [page(f"page-{i}", f"The sd logger board number {i}.") for i in range(5)]
+    store = vector_store.populate_vector_store(pages)
+
+    # A refresh in progress: the page is edited in Chroma, BM25 isn't rebuilt yet
+    edited = page("page-0", "The sd logger was replaced by the telemetry board.")
+    chunks = [Document(page_content=edited.page_content, metadata=edited.metadata)]
+    vector_store.upsert_sources(store, chunks)
+
+    stored = set(store.get(include=[])["ids"])
+    docs = retrieve("sd logger board number 0", k=3, mode="hybrid")
+    assert docs and all(doc.id in stored for doc in docs)
+    hits = keyword_search("sd logger board number 0", k=5)
+    assert hits and all(doc.id in stored for doc in hits)
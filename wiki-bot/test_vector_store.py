@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+from langchain_core.documents import Document
+
+WIKI_BOT = os.path.dirname(os.path.abspath(__file__))
+
+# Another process (e.g. main.py --incremental) adding a page to the index
+UPSERT_PAGE = """
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import llm
+llm.embeddings.base = DeterministicFakeEmbedding(size=32)
+from vector_store import get_vector_store, upsert_sources
+upsert_sources(
+    get_vector_store("chroma"),
+    [Document(page_content="zeta omega", metadata={"source": "https://wiki/new"})],
+)
+"""
+
+
+def test_store_reopened_after_another_process_writes(vector_store):
+    vector_store.upsert_sources(
+        vector_store.get_vector_store("chroma"),
+        [Document(page_content="alpha beta", metadata={"source": "https://wiki/old"})],
+    )
+    assert len(vector_store.get_vector_store("chroma").similarity_search("x", k=5)) == 1
+
+    subprocess.run(
+        [sys.executable, "-c", UPSERT_PAGE],
+        env={**os.environ, "PYTHONPATH": WIKI_BOT},
+        check=True,
+    )
+
+    store = vector_store.get_vector_store("chroma")
+    sources = {d.metadata["source"] for d in store.similarity_search("zeta omega", k=5)}
+    assert sources == {"https://wiki/old", "https://wiki/new"}
+
+
+def test_unchanged_refresh_keeps_the_index_version(vector_store):
+    pages = [
+        Document(page_content=f"page {i}", metadata={"source": f"https://wiki/{i}"})
+        for i in range(3)
+    ]
+    vector_store.populate_vector_store(pages)
+    version = vector_store.index_version()
+
+    vector_store.populate_vector_store(pages)
+    assert vector_store.index_version() == version
+
+    retitled = [
+        Document(page_content="page 0", metadata={**pages[0].metadata, "title": "New"})
+    ]
+    vector_store.populate_vector_store(retitled)
+    assert vector_store.index_version() != version
+
+
+def test_store_without_a_marker_is_dated_by_its_last_write(vector_store):
+    vector_store.populate_vector_store(
+        [Document(page_content="page", metadata={"source": "https://wiki/0"})]
+    )
+    os.remove(vector_store.INDEX_VERSION_FILE)
+
+    written = os.stat(vector_store.CHROMA_DB_FILE).st_mtime_ns
+    assert vector_store.index_version() == written
+    assert os.path.exists(vector_store.INDEX_VERSION_FILE)
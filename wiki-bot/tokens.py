@@ -0,0 +1,19 @@
+# Token counting for the embedding / chat models
+from functools import lru_cache
+import tiktoken
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # BPE file not cached and no network: fall back to an estimate
+        return None
+
+
+def count_tokens(text):
+    encoding = get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
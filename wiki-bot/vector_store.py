@@ -1,39 +1,260 @@
+import hashlib
 import os
 import shutil
-from config import DB_PATH
+import threading
+import time
+import numpy as np
+from bm25 import BM25Index
+from chromadb.api.client import SharedSystemClient
+from chunker import MarkdownChunker
+from config import DB_PATH, NUMPY_QUANTIZED, VECTOR_BACKEND
 from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from llm import embeddings
 from logger import log_node
+from numpy_store import META_FILE, NumpyVectorStore, get_all
+
+INDEX_VERSION_FILE = os.path.join(DB_PATH, "index_version")
+CHROMA_DB_FILE = os.path.join(DB_PATH, "chroma.sqlite3")
+NUMPY_INDEX_PATH = os.path.join(DB_PATH, "numpy_index")
+BM25_INDEX_PATH = os.path.join(DB_PATH, "bm25.json")
+
+# Process-wide store handles, one per backend, shared by every graph run
+_stores = {}
+_store_lock = threading.Lock()
 
 
 def reset_vector_store():
     if os.path.exists(DB_PATH):
         print(f"Cleaning up old database at {DB_PATH}...")
-        shutil.rmtree(DB_PATH)
+        with _store_lock:
+            _stores.clear()
+            # Chroma caches clients per path, drop them with the files
+            SharedSystemClient.clear_system_cache()
+            shutil.rmtree(DB_PATH)
         print("Database removed.")
 
 
-def get_vector_store():
-    return Chroma(persist_directory=DB_PATH, embedding_function=embeddings)
+def index_version(backend="chroma"):
+    """
+    Changes whenever any process writes to the index: mtime of the Chroma marker
+    file, of the NumPy index sidecar (written last on every build) or of the
+    BM25 file.
+    """
+    if backend == "numpy":
+        path = os.path.join(NUMPY_INDEX_PATH, META_FILE)
+    elif backend == "bm25":
+        path = BM25_INDEX_PATH
+    else:
+        path = INDEX_VERSION_FILE
+        if not os.path.exists(path) and os.path.exists(CHROMA_DB_FILE):
+            adopt_chroma_store()
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def adopt_chroma_store():
+    """
+    Writes the missing marker of a Chroma store built before markers existed
+    (or by another tool), dated by the store's last write rather than now.
+    """
+    written = os.stat(CHROMA_DB_FILE).st_mtime_ns
+    with open(INDEX_VERSION_FILE, "w") as f:
+        f.write(str(written / 1e9))
+    os.utime(INDEX_VERSION_FILE, ns=(written, written))
+
+
+def mark_index_updated():
+    os.makedirs(DB_PATH, exist_ok=True)
+    with open(INDEX_VERSION_FILE, "w") as f:
+        f.write(str(time.time()))
+
+    # Our own handle already sees our writes, no need to reopen it
+    with _store_lock:
+        if "chroma" in _stores:
+            _stores["chroma"] = (_stores["chroma"][0], index_version())
+
+
+def warm_vector_store(vector_store):
+    """Loads the collection and pages the HNSW index in with one throwaway query."""
+    collection = vector_store._collection
+    sample = collection.peek(1)
+    if len(sample["embeddings"]):
+        collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+
+
+def open_vector_store(backend):
+    if backend == "numpy":
+        return NumpyVectorStore(NUMPY_INDEX_PATH, embeddings)
+    if backend == "bm25":
+        return BM25Index(BM25_INDEX_PATH)
+
+    store = Chroma(persist_directory=DB_PATH, embedding_function=embeddings)
+    warm_vector_store(store)
+    return store
+
+
+def get_vector_store(backend=VECTOR_BACKEND):
+    """
+    Returns the shared, warmed-up store handle for `backend` ("chroma" or
+    "numpy"). It is opened once per process and reopened only when the index
+    has been rebuilt since (index_version). Writes always go to "chroma".
+    """
+    version = index_version(backend)
+    cached = _stores.get(backend)
+    if cached and cached[1] == version:
+        return cached[0]
+
+    with _store_lock:
+        cached = _stores.get(backend)
+        if not cached or cached[1] != version:
+            if cached and backend == "chroma":
+                # chromadb keeps one client (and its in-memory HNSW index) per
+                # path, reusing it would keep serving the old vectors
+                SharedSystemClient.clear_system_cache()
+            cached = _stores[backend] = (open_vector_store(backend), version)
+        return cached[0]
+
+
+def get_embeddings(vector_store, ids):
+    """
+    {id: float32 embedding} for the chunks of `ids` that are stored, IDs the
+    store doesn't have (any more) are left out.
+    """
+    if isinstance(vector_store, NumpyVectorStore):
+        ids = [i for i in ids if i in vector_store.rows]
+        return dict(zip(ids, vector_store.get_vectors(ids)))
+
+    stored = vector_store._collection.get(ids=list(ids), include=["embeddings"])
+    return {
+        i: np.asarray(vector, dtype=np.float32)
+        for i, vector in zip(stored["ids"], stored["embeddings"])
+    }
+
+
+def build_numpy_index():
+    """Exports the Chroma collection to the memory-mapped NumPy backend."""
+    rows = NumpyVectorStore.build(
+        get_vector_store("chroma"), NUMPY_INDEX_PATH, quantized=NUMPY_QUANTIZED
+    )
+    log_node("VECTOR_STORE", {"message": f"NumPy index built with {rows} chunks"})
+    return rows
+
+
+def build_bm25_index():
+    """Rebuilds the BM25 keyword index from the chunks stored in Chroma."""
+    rows = BM25Index.build(get_vector_store("chroma"), BM25_INDEX_PATH)
+    log_node("VECTOR_STORE", {"message": f"BM25 index built with {rows} chunks"})
+    return rows
+
+
+def get_bm25_index():
+    """Shared BM25 index handle, or None if it hasn't been built yet."""
+    if index_version("bm25") is None:
+        return None
+    return get_vector_store("bm25")
 
 
 def populate_vector_store(documents, reset=False):
     if reset:
         reset_vector_store()
 
-    vector_store = get_vector_store()
+    vector_store = get_vector_store("chroma")
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = text_splitter.split_documents(documents)
+    chunker = MarkdownChunker()
+    chunks = chunker.split_documents(documents)
 
-    vector_store.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=DB_PATH,
+    added, removed = upsert_sources(
+        vector_store, chunks, {d.metadata["source"] for d in documents}
     )
+    build_bm25_index()
 
     log_node(
-        "VECTOR_STORE", {"message": f"Vector store created with {len(chunks)} chunks"}
+        "VECTOR_STORE",
+        {
+            "message": f"Vector store has {len(chunks)} chunks "
+            f"({added} embedded, {removed} removed)"
+        },
     )
     return vector_store
+
+
+def chunk_id(chunk):
+    """Deterministic ID: same source + same text -> same ID, across runs."""
+    content_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()
+    key = f"{chunk.metadata['source']}\0{content_hash}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def upsert_sources(vector_store, chunks, sources=()):
+    """
+    Makes the stored chunks of every source in `sources` (plus the chunks' own
+    sources) exactly `chunks`. Only chunks whose ID isn't stored yet are
+    embedded, and new chunks are added before stale ones are deleted, so the
+    store stays queryable throughout. Returns (added, removed).
+    """
+    wanted = {}
+    for chunk in chunks:
+        wanted.setdefault(chunk_id(chunk), chunk)
+
+    sources = set(sources) | {c.metadata["source"] for c in chunks}
+    if not sources:
+        return 0, 0
+
+    stored = vector_store.get(
+        where={"source": {"$in": list(sources)}}, include=["metadatas"]
+    )
+    existing = dict(zip(stored["ids"], stored["metadatas"]))
+
+    new_ids = [i for i in wanted if i not in existing]
+    if new_ids:
+        vector_store.add_documents([wanted[i] for i in new_ids], ids=new_ids)
+
+    # Unchanged text keeps its embedding, only changed metadata (title...) is
+    # rewritten
+    changed_ids = [
+        i for i in wanted if i in existing and existing[i] != wanted[i].metadata
+    ]
+    if changed_ids:
+        vector_store._collection.update(
+            ids=changed_ids, metadatas=[wanted[i].metadata for i in changed_ids]
+        )
+
+    stale_ids = list(existing.keys() - wanted.keys())
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+
+    # A refresh of an unchanged wiki keeps the version (and the answer cache)
+    if new_ids or changed_ids or stale_ids:
+        mark_index_updated()
+    return len(new_ids), len(stale_ids)
+
+
+def prune_sources(vector_store, live_sources):
+    """Deletes chunks of every source that is not in `live_sources`."""
+    live_sources = set(live_sources)
+    stored = get_all(vector_store, ["metadatas"])
+
+    stale_ids = [
+        i
+        for i, metadata in zip(stored["ids"], stored["metadatas"])
+        if metadata.get("source") not in live_sources
+    ]
+    if stale_ids:
+        vector_store.delete(ids=stale_ids)
+        mark_index_updated()
+    return len(stale_ids)
+
+
+def delete_sources(vector_store, sources):
+    """Removes every chunk whose source URL is in `sources`."""
+    sources = list(sources)
+    if not sources:
+        return 0
+
+    ids = vector_store.get(where={"source": {"$in": sources}}, include=[])["ids"]
+    if ids:
+        vector_store.delete(ids=ids)
+        mark_index_updated()
+    return len(ids)